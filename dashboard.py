@@ -1,26 +1,66 @@
 # app.py
 import json
+import os
+import sys
+import argparse
+import csv
+import gzip
+import tempfile
+import sqlite3
 import uuid
 import base64
+import hashlib
 from datetime import datetime, date
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 import io
 import mimetypes
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # not on Windows: single-process deployments only, locking becomes a no-op
+    fcntl = None
 
 import pandas as pd
 import streamlit as st
+try:
+    from PIL import Image
+except ImportError:  # no thumbnails: previews fall back to the full image
+    Image = None
+try:
+    import xlsxwriter
+except ImportError:  # no billing workbook export
+    xlsxwriter = None
+try:
+    import openpyxl
+except ImportError:  # bulk import takes CSV only
+    openpyxl = None
 
 # -------------------------
 # Files / constants
 # -------------------------
 DATA_FILE = Path("tasks_data.json")
-# Keep attachments dir for backwards-compat / migration if needed (not used for new uploads)
+# Append-only journal of mutations since the last snapshot in DATA_FILE (one compact JSON record per line)
+JOURNAL_FILE = Path("tasks_data.journal")
+JOURNAL_COMPACT_BYTES = 256 * 1024  # fold the journal into a new snapshot once it grows past this
+# Advisory lock serializing snapshot/journal writes across processes (Streamlit workers)
+LOCK_FILE = Path("tasks_data.lock")
+# Storage backend: "json" (DATA_FILE + JOURNAL_FILE) or "sqlite" (DB_FILE, imported from DATA_FILE on first use)
+STORAGE_BACKEND = os.environ.get("DASHBOARD_STORAGE", "json")
+DB_FILE = Path("tasks_data.sqlite3")
+# Content-addressed blob store for attachment bytes: attachments/<sha256[:2]>/<sha256>
 ATTACH_DIR = Path("attachments")
 ATTACH_DIR.mkdir(exist_ok=True)
+# Preview thumbnails, generated once per blob: attachments/thumbs/<sha256[:2]>/<sha256>_<THUMB_PX>
+THUMB_DIR = ATTACH_DIR / "thumbs"
+THUMB_PX = 320  # longest side
+BLOB_CACHE_BYTES = 64 * 1024 * 1024  # in-memory LRU budget for blob/thumbnail bytes shared by all sessions
 STATUSES = ["ready", "inprogress", "completed"]
 TYPE_OPTIONS = ["task", "defect"]
-STATE_KEY = "items"  # st.session_state[STATE_KEY]
+# Bump when _coerce_item's output shape changes; items tagged with the current version skip re-sanitizing
+SCHEMA_VERSION = 4
 
 # -------------------------
 # Simple developer credentials (as requested)
@@ -34,33 +74,178 @@ DEV_PASSWORD = "jesBMW518"
 def _now_iso() -> str:
     return datetime.now().isoformat()
 
-def _encode_uploaded_file_to_b64(uploaded_file, item_id: str) -> Dict[str, Any]:
-    """Encode an UploadedFile to a base64-attached dict for storing in JSON."""
+def _uploaded_file_bytes(uploaded_file) -> bytes:
     try:
-        data = uploaded_file.getbuffer()
+        return bytes(uploaded_file.getbuffer())
     except Exception:
         # fallback: try reading .read()
         try:
             uploaded_file.seek(0)
-            data = uploaded_file.read()
+            return uploaded_file.read()
         except Exception:
-            data = b""
-    b64 = base64.b64encode(data).decode("ascii")
+            return b""
+
+# -------------------------
+# Durable writes & cross-process locking
+# -------------------------
+_held_locks = threading.local()
+
+@contextmanager
+def _file_lock(path: Path, exclusive: bool = True):
+    """fcntl advisory lock on path: exclusive for writers, shared for readers. Re-entrant within a
+       thread (a nested acquisition rides on the outer one, so don't nest exclusive inside shared)."""
+    held = getattr(_held_locks, "paths", None)
+    if held is None:
+        held = _held_locks.paths = set()
+    if fcntl is None or path in held:
+        yield
+        return
+    with open(path, "a+b") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _atomic_write(path: Path, data: bytes):
+    """Write data to a temp file next to path, fsync it and os.replace it into place, so readers see
+       either the old or the new file, never a truncated one (even across a crash)."""
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    if hasattr(os, "O_DIRECTORY"):
+        # make the rename itself durable
+        fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+# -------------------------
+# Blob store (content-addressed by SHA-256)
+# -------------------------
+def _blob_path(sha256: str) -> Path:
+    return ATTACH_DIR / sha256[:2] / sha256
+
+def put_blob(data: bytes) -> str:
+    """Write bytes to the blob store (once per distinct content) and return their SHA-256."""
+    sha256 = hashlib.sha256(data).hexdigest()
+    p = _blob_path(sha256)
+    if not p.exists():
+        p.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(p, data)
+    return sha256
+
+class ByteLRU:
+    """Thread-safe LRU of bytes values bounded by their total size (not entry count).
+       Values larger than an eighth of the budget aren't cached, so one huge file can't flush the rest."""
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.size = 0
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes):
+        if len(value) > self.budget // 8:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.budget:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+@st.cache_resource
+def get_blob_cache() -> ByteLRU:
+    """Process-wide, so reruns and other sessions rendering the same attachment don't hit disk again.
+       Keys are content hashes, so entries never go stale."""
+    return ByteLRU(BLOB_CACHE_BYTES)
+
+def get_blob(sha256: str) -> bytes:
+    cache = get_blob_cache()
+    data = cache.get(sha256)
+    if data is not None:
+        return data
+    try:
+        with open(_blob_path(sha256), "rb") as f:
+            data = f.read()
+    except Exception:
+        return b""
+    cache.put(sha256, data)
+    return data
+
+def get_thumbnail(sha256: str) -> Optional[bytes]:
+    """Small JPEG/PNG preview of an image blob, cached on disk by content hash. None when one can't
+       be made (no PIL, missing blob, not a decodable image); callers then show the full image."""
+    key = f"thumb:{sha256}_{THUMB_PX}"
+    cache = get_blob_cache()
+    thumb = cache.get(key)
+    if thumb is not None:
+        return thumb
+    p = THUMB_DIR / sha256[:2] / f"{sha256}_{THUMB_PX}"
+    try:
+        thumb = p.read_bytes()
+        cache.put(key, thumb)
+        return thumb
+    except FileNotFoundError:
+        pass
+    if Image is None:
+        return None
+    try:
+        with Image.open(_blob_path(sha256)) as img:
+            img.draft("RGB", (THUMB_PX, THUMB_PX))  # JPEG: let the decoder downscale (much cheaper)
+            img.thumbnail((THUMB_PX, THUMB_PX))
+            alpha = img.mode in ("RGBA", "LA", "P")
+            img = img.convert("RGBA" if alpha else "RGB")
+            buf = io.BytesIO()
+            img.save(buf, format="PNG" if alpha else "JPEG", quality=80, optimize=True)
+    except Exception:
+        return None
+    thumb = buf.getvalue()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    _atomic_write(p, thumb)
+    cache.put(key, thumb)
+    return thumb
+
+def _store_uploaded_file(uploaded_file, item_id: str) -> Dict[str, Any]:
+    """Put an UploadedFile into the blob store and return its attachment metadata dict."""
+    data = _uploaded_file_bytes(uploaded_file)
     mime = getattr(uploaded_file, "type", "") or mimetypes.guess_type(uploaded_file.name)[0] or "application/octet-stream"
     return {
         "id": f"{item_id}_{uuid.uuid4().hex}",
         "name": uploaded_file.name,
         "mime": mime,
-        "data": b64,
+        "sha256": put_blob(data),
+        "size": len(data),
     }
 
 def _read_file_bytes(att) -> bytes:
     """Return bytes for an attachment entry which may be:
-       - a dict {name,mime,data}
-       - a legacy path string (try to read from disk)
-       - a dict with 'path' (legacy)
+       - a dict {id,name,mime,sha256,size} (resolved through the blob store)
+       - a dict with inline base64 'data' (legacy, not yet migrated)
+       - a legacy path string or dict with 'path' (try to read from disk)
     """
     if isinstance(att, dict):
+        if att.get("sha256"):
+            return get_blob(att["sha256"])
         if att.get("data"):
             try:
                 return base64.b64decode(att["data"])
@@ -82,61 +267,917 @@ def _read_file_bytes(att) -> bytes:
                 return b""
     return b""
 
+# -------------------------
+# Item store (ordered list + id index)
+# -------------------------
+# Dashboard sections as predicates; ItemStore keeps one bucket per entry, updated incrementally
+BUCKETS = {
+    "ready": lambda it: it.get("status") == "ready" and not it.get("archived"),
+    "inprogress": lambda it: it.get("status") == "inprogress" and not it.get("archived"),
+    "needs_dev_response": lambda it: bool(it.get("review_requested")) and not it.get("archived"),
+    "payments_pending": lambda it: bool(it.get("payment_requested")) and not it.get("payment_confirmed_by_dev") and not it.get("archived"),
+    "needs_approval": lambda it: it.get("status") == "completed" and bool(it.get("needs_client_approval")) and not it.get("archived"),
+    "approved": lambda it: it.get("status") == "completed" and bool(it.get("client_approved")) and not it.get("archived"),
+    "completed_or_archived": lambda it: it.get("status") == "completed" or bool(it.get("archived")),
+}
+# fields the BUCKETS predicates read; updates touching none of these skip re-bucketing
+BUCKET_FIELDS = {"status", "archived", "review_requested", "payment_requested", "payment_confirmed_by_dev", "needs_client_approval", "client_approved"}
+# billing aggregates: completed / archived items summed per (client, project, billable, month of completion)
+BILLING_KEY = ("client", "project", "billable", "month")
+BILLING_FIELDS = {"status", "archived", "client", "project", "billable", "completed_at", "hours", "amount"}
+
+class ItemStore:
+    """Ordered task list kept as an insertion-ordered id -> item dict, so flows look up, replace
+       and remove items in O(1), plus the BUCKETS section indexes. Iterates (and len()s) like the plain list it replaces; mutate it
+       only through add/remove/update so the indexes stay in step.
+       One instance is shared by all sessions (get_item_store): mutations and transactions hold
+       `lock`, and `generation` counts mutations so caches can key on it.
+       Billing totals (billing_summary) are kept up to date the same way as the buckets."""
+    def __init__(self, items: Optional[List[Dict[str, Any]]] = None):
+        self.lock = threading.RLock()
+        self.generation = 0
+        self._by_id: Dict[str, Dict[str, Any]] = {}  # list order is the dict's insertion order
+        self._pos: Dict[str, int] = {}
+        self._seq = 0
+        self._buckets: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in BUCKETS}
+        self._sorted: Dict[tuple, tuple] = {}  # (bucket, field, descending) -> (generation, ordered items)
+        self._billing: Dict[tuple, List[float]] = {}  # BILLING_KEY values -> [hours, amount, tasks]
+        self._billed: Dict[str, tuple] = {}  # item id -> (key, hours, amount) it currently contributes
+        for it in items or []:
+            self.add(it)
+
+    def __iter__(self):
+        # iterate a copy so a concurrent add/remove from another session can't break the loop
+        with self.lock:
+            return iter(list(self._by_id.values()))
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, item_id) -> bool:
+        return item_id in self._by_id
+
+    def get(self, item_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(item_id)
+
+    def add(self, item: Dict[str, Any]):
+        """Append item, or replace the item with the same id in place."""
+        with self.lock:
+            if item["id"] not in self._by_id:
+                self._pos[item["id"]] = self._seq
+                self._seq += 1
+            # assigning an existing key keeps its place in the order
+            self._by_id[item["id"]] = item
+            self._rebucket(item)
+            self._rebill(item)
+            self.generation += 1
+
+    def remove(self, item_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            it = self._by_id.pop(item_id, None)
+            if it is not None:
+                self._pos.pop(item_id, None)
+                for bucket in self._buckets.values():
+                    bucket.pop(item_id, None)
+                self._unbill(item_id)
+                self.generation += 1
+            return it
+
+    def update(self, it: Dict[str, Any], fields: Dict[str, Any]):
+        """Set fields on an item, moving it between buckets if a bucketed field changed."""
+        with self.lock:
+            it.update(fields)
+            if BUCKET_FIELDS.intersection(fields):
+                self._rebucket(it)
+            if BILLING_FIELDS.intersection(fields):
+                self._rebill(it)
+            self.generation += 1
+
+    def touch(self):
+        """Record an in-place change the store can't see (e.g. a comment appended to an item)."""
+        with self.lock:
+            self.generation += 1
+
+    def bucket(self, name: str) -> List[Dict[str, Any]]:
+        """Items in a BUCKETS section, in list order."""
+        with self.lock:
+            return sorted(self._buckets[name].values(), key=lambda it: self._pos[it["id"]])
+
+    def count(self, name: str) -> int:
+        return len(self._buckets[name])
+
+    def page(self, name: str, start: int, size: int, sort: Optional[str] = None, descending: bool = False) -> List[Dict[str, Any]]:
+        """items[start:start + size] of a bucket, in list order or ordered by an item field (missing
+           values last). The sorted order is cached until the store next changes, so paging through
+           a section doesn't re-sort it."""
+        with self.lock:
+            key = (name, sort, descending)
+            cached = self._sorted.get(key)
+            if cached is None or cached[0] != self.generation:
+                if sort is None:
+                    order = self.bucket(name)
+                    if descending:
+                        order.reverse()
+                else:
+                    present = [it for it in self._buckets[name].values() if it.get(sort) is not None]
+                    missing = [it for it in self._buckets[name].values() if it.get(sort) is None]
+                    order = sorted(present, key=lambda it: it[sort], reverse=descending) + missing
+                cached = self._sorted[key] = (self.generation, order)
+            return cached[1][start:start + size]
+
+    def billing_summary(self, by=BILLING_KEY) -> List[Dict[str, Any]]:
+        """Precomputed hours / amount / task counts of completed and archived items, rolled up over
+           the BILLING_KEY fields in `by` (all of them by default; () gives the grand total).
+           Costs O(groups), not O(items)."""
+        idx = [BILLING_KEY.index(f) for f in by]
+        rolled: Dict[tuple, List[float]] = {}
+        with self.lock:
+            for key, (hours, amount, tasks) in self._billing.items():
+                acc = rolled.setdefault(tuple(key[i] for i in idx), [0.0, 0.0, 0])
+                acc[0] += hours
+                acc[1] += amount
+                acc[2] += tasks
+        return [
+            dict(zip(by, key), hours=round(hours, 2), amount=round(amount, 2), tasks=tasks)
+            for key, (hours, amount, tasks) in sorted(rolled.items(), key=lambda kv: tuple(str(k) for k in kv[0]))
+        ]
+
+    def _rebill(self, it: Dict[str, Any]):
+        self._unbill(it["id"])
+        if not (it.get("status") == "completed" or it.get("archived")):
+            return
+        key = (it.get("client") or "", it.get("project") or "", bool(it.get("billable")), (it.get("completed_at") or "")[:7])
+        hours, amount = _to_float(it.get("hours")), _to_float(it.get("amount"))
+        acc = self._billing.setdefault(key, [0.0, 0.0, 0])
+        acc[0] += hours
+        acc[1] += amount
+        acc[2] += 1
+        self._billed[it["id"]] = (key, hours, amount)
+
+    def _unbill(self, item_id: str):
+        prev = self._billed.pop(item_id, None)
+        if prev is None:
+            return
+        key, hours, amount = prev
+        acc = self._billing[key]
+        acc[2] -= 1
+        if acc[2] == 0:
+            del self._billing[key]  # also drops accumulated float error
+        else:
+            acc[0] -= hours
+            acc[1] -= amount
+
+    def _rebucket(self, it: Dict[str, Any]):
+        for name, pred in BUCKETS.items():
+            if pred(it):
+                self._buckets[name][it["id"]] = it
+            else:
+                self._buckets[name].pop(it["id"], None)
+
 # -------------------------
 # Persistence
 # -------------------------
-def load_data() -> List[Dict[str, Any]]:
-    if not DATA_FILE.exists():
-        return []
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-        return _normalize_loaded(raw)
-    except Exception:
-        return []
+def load_data() -> ItemStore:
+    items = ItemStore(get_storage().load())
+    # one-shot: move inline base64 payloads out to the blob store and collapse comment-level
+    # attachment copies into id references, then rewrite the (much smaller) data
+    changed: set = set()
+    migrate_inline_attachments(items, changed)
+    collapse_comment_attachments(items, changed)
+    if changed:
+        save_and_persist(items, changed)
+    return items
+
+@st.cache_resource
+def get_item_store() -> "ItemStore":
+    """The process-wide item store shared by every session (sessions only keep UI state)."""
+    return load_data()
 
-def save_and_persist(items: List[Dict[str, Any]]):
-    """Canonical save function used everywhere to persist state to JSON and keep session state synced."""
-    cleaned = sanitize_items(items)
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(cleaned, f, indent=2, ensure_ascii=False)
-    st.session_state[STATE_KEY] = cleaned
+def save_and_persist(items: "ItemStore", item_ids):
+    """Write the items a load-time migration rewrote through the storage backend.
+       Flow functions should use persist_delta instead; this is the migration path."""
+    get_storage().save_items(items, item_ids)
+
+def persist_delta(items: ItemStore, records: List[Dict[str, Any]]):
+    """Persist mutation records through the storage backend (O(delta) write).
+       Record shapes:
+         {"op": "create", "item": {...}}
+         {"op": "update", "id": ..., "fields": {..., "version": n + 1}, "expected": n}
+         {"op": "comment", "id": ..., "entry": {...}, "attachments": [...], "updated_at": ..., "version": n + 1, "expected": n}
+         {"op": "delete", "id": ..., "expected": n}
+       "expected" is the item version the write was based on; storage rejects it if that's stale.
+    """
+    if records:
+        get_storage().write(items, records)
+
+def _apply_record(items: ItemStore, rec: Dict[str, Any]):
+    """Apply one journal record to items in place. Idempotent, so replaying a record that
+       already made it into the snapshot (crash between snapshot and journal removal) is harmless."""
+    op = rec.get("op")
+    if op == "create":
+        items.add(_coerce_item(rec.get("item") or {}))
+        return
+    if op == "delete":
+        items.remove(rec.get("id"))
+        return
+    it = items.get(rec.get("id"))
+    if it is None:
+        return
+    if op == "update":
+        items.update(it, rec.get("fields") or {})
+    elif op == "comment":
+        entry = _coerce_comment_entry(rec.get("entry") or {}, it["id"])
+        history = it.setdefault("comment_history", [])
+        if any(e.get("at") == entry.get("at") and e.get("actor") == entry.get("actor") and e.get("comment") == entry.get("comment") for e in history):
+            return
+        known = {a.get("id") for a in it.get("attachments", []) if isinstance(a, dict)}
+        for idx, a in enumerate(rec.get("attachments") or []):
+            ca = _coerce_attachment(a, it["id"], idx)
+            if ca and ca["id"] not in known:
+                it.setdefault("attachments", []).append(ca)
+        history.append(entry)
+        if rec.get("updated_at"):
+            it["updated_at"] = rec["updated_at"]
+        if rec.get("version") is not None:
+            it["version"] = rec["version"]
+        items.touch()
+
+class ConflictError(Exception):
+    """A transaction's compare-and-swap failed: another writer changed one of its items first.
+       The affected items have already been reloaded from storage when this is raised."""
+    def __init__(self, item_ids):
+        self.item_ids = sorted(set(item_ids))
+        super().__init__(f"Concurrent change to item(s): {', '.join(i[:8] for i in self.item_ids)}")
+
+def _expected_versions(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """item id -> version the first record touching it expects to find in storage (None for creates)."""
+    out: Dict[str, Any] = {}
+    for rec in records:
+        item_id = rec.get("id") or (rec.get("item") or {}).get("id")
+        if item_id and item_id not in out:
+            out[item_id] = rec.get("expected")
+    return out
+
+class Storage:
+    """Repository interface for the task list. Backends persist the record shapes documented on
+       persist_delta, so a flow only ever writes what it changed. apply() is a compare-and-swap:
+       it raises ConflictError if an item's stored version isn't the record's "expected" one."""
+    def load(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def load_items(self, item_ids) -> Dict[str, Dict[str, Any]]:
+        """Current stored state of just these items (missing ids are absent from the result)."""
+        raise NotImplementedError
+
+    def apply(self, items: ItemStore, records: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    def save_all(self, items: ItemStore) -> List[Dict[str, Any]]:
+        """Replace the stored dataset with items; returns the sanitized list that was written."""
+        raise NotImplementedError
+
+    def save_items(self, items: ItemStore, item_ids):
+        """Persist items rewritten wholesale outside the record flow (load-time migrations) and bump
+           their versions, without dropping what other writers stored since items was loaded."""
+        raise NotImplementedError
+
+    def refresh(self, items: ItemStore) -> bool:
+        """Pull in what other processes persisted since we last looked; True if anything changed.
+           Called on every rerun, so it must be cheap when nothing did."""
+        return False
+
+    _depth = 0
+    _pending: Optional[List[Dict[str, Any]]] = None
+
+    @contextmanager
+    def transaction(self, items: ItemStore):
+        """Unit of work: records written inside the block are buffered and flushed with a single
+           apply() when the outermost block exits. Nested blocks join the outer one. If the block
+           raises, the buffered records are dropped and the touched items are reloaded from storage.
+           Holds items.lock throughout, so concurrent sessions' units of work don't interleave."""
+        with items.lock:
+            self._depth += 1
+            if self._depth == 1:
+                self._pending = []
+            ok = False
+            try:
+                yield self
+                ok = True
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    pending, self._pending = self._pending, None
+                    if pending:
+                        if ok:
+                            self._commit(items, pending)
+                        else:
+                            self.reload_items(items, _expected_versions(pending))
+
+    def write(self, items: ItemStore, records: List[Dict[str, Any]]):
+        """Persist records now, or buffer them if a transaction is open."""
+        with items.lock:
+            if self._pending is not None:
+                self._pending.extend(records)
+            else:
+                self._commit(items, records)
+
+    def reload_items(self, items: ItemStore, item_ids):
+        """Replace (or drop) the in-memory copies of item_ids with their stored state."""
+        fresh = self.load_items(item_ids)
+        with items.lock:
+            for item_id in item_ids:
+                if item_id in fresh:
+                    items.add(fresh[item_id])
+                else:
+                    items.remove(item_id)
+
+    def _commit(self, items: ItemStore, records: List[Dict[str, Any]]):
+        try:
+            self.apply(items, records)
+        except ConflictError:
+            # the in-memory items already carry this transaction's changes; put back what's stored
+            self.reload_items(items, _expected_versions(records))
+            raise
+
+class JsonFileStorage(Storage):
+    """Snapshot in DATA_FILE plus an append-only journal of records in JOURNAL_FILE.
+       Other processes append to the same journal, so before appending, apply() catches up on the
+       records written since we last read it (the "tail"); a tail record for an item we're about to
+       write means our expected version is stale.
+       Writers (catch-up + CAS check + append, compaction) hold an exclusive lock on lock_file; readers
+       take it shared only while reading the raw bytes, and the snapshot is only ever replaced atomically."""
+    def __init__(self, data_file: Path = DATA_FILE, journal_file: Path = JOURNAL_FILE, lock_file: Path = LOCK_FILE):
+        self.data_file = data_file
+        self.journal_file = journal_file
+        self.lock_file = lock_file
+        self._offset = 0  # journal bytes already reflected in memory
+        self._snapshot_sig = None  # identifies the snapshot _offset refers to
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Rebuild state as snapshot + replay of the journal."""
+        store, stale, replayed = self._read_disk()
+        if stale or (replayed and self._offset > JOURNAL_COMPACT_BYTES):
+            self.compact(store)
+        return list(store)
+
+    def load_items(self, item_ids) -> Dict[str, Dict[str, Any]]:
+        # don't move _offset: only these ids get copied into memory, so the journal tail other
+        # processes wrote for the rest must still be picked up by the next _sync / refresh
+        store = self._read_disk(remember=False)[0]
+        return {i: store.get(i) for i in item_ids if store.get(i) is not None}
+
+    def apply(self, items: ItemStore, records: List[Dict[str, Any]]):
+        """CAS-check against other writers, append records to the journal; compact once it passes the threshold."""
+        expected = _expected_versions(records)
+        payload = "".join(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n" for rec in records)
+        with _file_lock(self.lock_file):
+            changed = self._sync(items, skip=expected)
+            conflicts = [i for i, version in changed.items() if i in expected and version != expected[i]]
+            if conflicts:
+                raise ConflictError(conflicts)
+            # _sync read up to the last complete line; anything after it is a torn append from a
+            # writer that crashed (appends happen under this lock), so cut it off rather than glue onto it
+            if self.journal_file.exists() and self.journal_file.stat().st_size > self._offset:
+                os.truncate(self.journal_file, self._offset)
+            with open(self.journal_file, "a", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+                self._offset = f.tell()
+            if self._offset > JOURNAL_COMPACT_BYTES:
+                self.compact(items)
+
+    def refresh(self, items: ItemStore) -> bool:
+        """Two stat() calls; only a replaced snapshot or a grown journal takes the lock and syncs."""
+        journal_sig = self._stat_sig(self.journal_file)
+        if self._stat_sig(self.data_file) == self._snapshot_sig and (journal_sig is None or journal_sig[2] <= self._offset):
+            return False
+        with items.lock, _file_lock(self.lock_file, exclusive=False):
+            return bool(self._sync(items))
+
+    def save_all(self, items: ItemStore) -> List[Dict[str, Any]]:
+        cleaned = sanitize_items(items)
+        data = json.dumps(cleaned, indent=2, ensure_ascii=False).encode("utf-8")
+        with _file_lock(self.lock_file):
+            _atomic_write(self.data_file, data)
+            # everything in the journal is now part of the snapshot
+            self.journal_file.unlink(missing_ok=True)
+            self._offset = 0
+            self._snapshot_sig = self._stat_sig(self.data_file)
+        return cleaned
+
+    def save_items(self, items: ItemStore, item_ids):
+        """Catch up on other writers first (their records merge onto the rewritten items), then
+           snapshot everything."""
+        with items.lock, _file_lock(self.lock_file):
+            self._sync(items)
+            for item_id in item_ids:
+                it = items.get(item_id)
+                if it is not None:
+                    items.update(it, {"version": it.get("version", 0) + 1})
+            self.save_all(items)
+
+    def compact(self, items: ItemStore):
+        """Fold the journal into a new snapshot. Catches up on other writers' records first so none
+           are dropped; otherwise in-memory items are left untouched, so a flow that triggers
+           compaction halfway through keeps working on the same dicts."""
+        with _file_lock(self.lock_file):
+            self._sync(items)
+            self.save_all(items)
+
+    @staticmethod
+    def _stat_sig(path: Path):
+        try:
+            st_ = path.stat()
+        except FileNotFoundError:
+            return None
+        return (st_.st_ino, st_.st_mtime_ns, st_.st_size)
+
+    def _read_disk(self, remember: bool = True):
+        """Parse snapshot + journal. Returns (ItemStore, snapshot_is_stale_schema, records_replayed)
+           and, if remember, records the journal offset / snapshot identity it corresponds to (only
+           correct when the caller brings all of its in-memory items up to that state)."""
+        items: List[Dict[str, Any]] = []
+        stale = False
+        # hold the shared lock only while grabbing the bytes, so snapshot and journal match; parse after
+        with _file_lock(self.lock_file, exclusive=False):
+            sig = self._stat_sig(self.data_file)
+            snapshot = self.data_file.read_bytes() if sig is not None else None
+            records, offset = self._read_journal(0)
+        if snapshot is not None:
+            try:
+                raw = json.loads(snapshot)
+                items = _normalize_loaded(raw)
+                # snapshot written by an older schema: persist the normalized form (e.g. minted ids) once
+                stale = not (isinstance(raw, list) and all(isinstance(d, dict) and d.get("schema_version") == SCHEMA_VERSION for d in raw))
+            except Exception:
+                items = []
+        store = ItemStore(items)
+        for rec in records:
+            _apply_record(store, rec)
+        if remember:
+            self._offset = offset
+            self._snapshot_sig = sig
+        return store, stale, len(records)
+
+    def _read_journal(self, offset: int):
+        """Complete records from byte offset on, and the offset just past the last complete line.
+           A torn trailing line (crash or another writer mid-append) is left for the next read."""
+        if not self.journal_file.exists():
+            return [], 0
+        with open(self.journal_file, "rb") as f:
+            f.seek(offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1
+        records = []
+        for line in chunk[:end].splitlines():
+            try:
+                rec = json.loads(line)
+            except Exception:
+                continue
+            if isinstance(rec, dict):
+                records.append(rec)
+        return records, offset + end
+
+    def _sync(self, items: ItemStore, skip=()) -> Dict[str, Any]:
+        """Bring items up to date with what other writers persisted since we last read; ids in skip
+           are left alone. Returns {id: stored version (None if gone)} for the ids that changed on disk."""
+        changed: Dict[str, Any] = {}
+        if self._stat_sig(self.data_file) != self._snapshot_sig:
+            # someone wrote a new snapshot (compaction): our journal offset is meaningless, re-read it all
+            disk = self._read_disk()[0]
+            for it in disk:
+                mine = items.get(it["id"])
+                if mine is None or mine.get("version") != it.get("version"):
+                    changed[it["id"]] = it.get("version")
+                    if it["id"] not in skip:
+                        items.add(it)
+            for it in items:
+                if it["id"] not in disk:
+                    changed[it["id"]] = None
+                    if it["id"] not in skip:
+                        items.remove(it["id"])
+            return changed
+        if self._stat_sig(self.journal_file) is None or self.journal_file.stat().st_size <= self._offset:
+            return changed
+        records, self._offset = self._read_journal(self._offset)
+        for rec in records:
+            item_id = rec.get("id") or (rec.get("item") or {}).get("id")
+            if rec.get("op") == "delete":
+                changed[item_id] = None
+            elif rec.get("op") == "create":
+                changed[item_id] = (rec.get("item") or {}).get("version", 0)
+            elif rec.get("op") == "update":
+                changed[item_id] = (rec.get("fields") or {}).get("version")
+            else:
+                changed[item_id] = rec.get("version")
+            if item_id not in skip:
+                _apply_record(items, rec)
+        return changed
+
+# scalar item columns stored in the sqlite items table (comment_history / attachments live in their own tables)
+ITEM_COLUMNS = [
+    "id","type","title","client","project","billable","status","hours","rate_at_completion","amount",
+    "created_at","updated_at","completed_at","archived","needs_client_approval","client_approved",
+    "review_requested","payment_requested","payment_confirmed_by_dev","payment_requested_at","payment_confirmed_at",
+    "version",
+]
+BOOL_COLUMNS = {"billable","archived","needs_client_approval","client_approved","review_requested","payment_requested","payment_confirmed_by_dev"}
+ATTACHMENT_COLUMNS = ["id","name","mime","sha256","size","path"]
+
+class SqliteStorage(Storage):
+    """SQLite (WAL) storage: items, comment entries and attachment metadata in separate tables, so a
+       flow becomes a handful of single-row UPDATE/INSERTs. Each one is guarded by
+       `WHERE version = expected`, and a miss rolls the whole transaction back as a ConflictError.
+       Every write transaction bumps meta.generation, which refresh() polls to spot other writers."""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS items (
+            id TEXT PRIMARY KEY, type TEXT, title TEXT, client TEXT, project TEXT, billable INTEGER,
+            status TEXT, hours REAL, rate_at_completion REAL, amount REAL,
+            created_at TEXT, updated_at TEXT, completed_at TEXT, archived INTEGER,
+            needs_client_approval INTEGER, client_approved INTEGER, review_requested INTEGER,
+            payment_requested INTEGER, payment_confirmed_by_dev INTEGER,
+            payment_requested_at TEXT, payment_confirmed_at TEXT, version INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS comments (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, item_id TEXT NOT NULL, actor TEXT, comment TEXT,
+            at TEXT, attachment_ids TEXT
+        );
+        CREATE TABLE IF NOT EXISTS attachments (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, item_id TEXT NOT NULL, name TEXT,
+            mime TEXT, sha256 TEXT, size INTEGER, path TEXT
+        );
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE INDEX IF NOT EXISTS idx_items_status ON items(status);
+        CREATE INDEX IF NOT EXISTS idx_items_client ON items(client);
+        CREATE INDEX IF NOT EXISTS idx_items_completed_at ON items(completed_at);
+        CREATE INDEX IF NOT EXISTS idx_items_archived ON items(archived);
+        CREATE INDEX IF NOT EXISTS idx_comments_item ON comments(item_id);
+        CREATE INDEX IF NOT EXISTS idx_attachments_item ON attachments(item_id);
+    """
+
+    def __init__(self, path: Path = DB_FILE):
+        self.path = path
+        self._seen = None  # meta.generation our in-memory items reflect
+        with self._connect() as con:
+            con.executescript(self.SCHEMA)
+            con.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+            if "version" not in {r[1] for r in con.execute("PRAGMA table_info(items)")}:
+                con.execute("ALTER TABLE items ADD COLUMN version INTEGER DEFAULT 0")
+            imported = con.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+        if not imported:
+            # first run on sqlite: import the existing JSON data (the attachments table has no room for
+            # inline payloads, so move them to the blob store first)
+            items = ItemStore(JsonFileStorage().load())
+            migrate_inline_attachments(items)
+            collapse_comment_attachments(items)
+            self.save_all(items)
+            with self._connect() as con:
+                con.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)", (_now_iso(),))
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    def load(self) -> List[Dict[str, Any]]:
+        with self._connect() as con:
+            self._seen = self._generation(con)
+            return self._select(con)
+
+    def load_items(self, item_ids) -> Dict[str, Dict[str, Any]]:
+        item_ids = list(item_ids)
+        if not item_ids:
+            return {}
+        with self._connect() as con:
+            return {it["id"]: it for it in self._select(con, item_ids)}
+
+    def _select(self, con: sqlite3.Connection, item_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        con.row_factory = sqlite3.Row
+        where, params = "", []
+        if item_ids is not None:
+            where, params = f" WHERE {{col}} IN ({','.join('?' * len(item_ids))})", list(item_ids)
+        items = []
+        by_id = {}
+        for row in con.execute(f"SELECT {','.join(ITEM_COLUMNS)} FROM items{where.format(col='id')} ORDER BY rowid", params):
+            it = {k: (bool(row[k]) if k in BOOL_COLUMNS else row[k]) for k in ITEM_COLUMNS}
+            it["comment_history"] = []
+            it["attachments"] = []
+            items.append(it)
+            by_id[it["id"]] = it
+        for row in con.execute(f"SELECT item_id,{','.join(ATTACHMENT_COLUMNS)} FROM attachments{where.format(col='item_id')} ORDER BY seq", params):
+            if row["item_id"] in by_id:
+                a = {k: row[k] for k in ATTACHMENT_COLUMNS if k != "path"}
+                if row["path"]:
+                    a["path"] = row["path"]
+                by_id[row["item_id"]]["attachments"].append(a)
+        for row in con.execute(f"SELECT item_id,actor,comment,at,attachment_ids FROM comments{where.format(col='item_id')} ORDER BY seq", params):
+            if row["item_id"] in by_id:
+                by_id[row["item_id"]]["comment_history"].append({
+                    "actor": row["actor"],
+                    "comment": row["comment"],
+                    "attachment_ids": json.loads(row["attachment_ids"] or "[]"),
+                    "at": row["at"],
+                })
+        return sanitize_items(items)
+
+    def apply(self, items: ItemStore, records: List[Dict[str, Any]]):
+        with self._connect() as con:
+            gen = self._bump_generation(con)
+            for rec in records:
+                self._apply_sql(con, rec)
+        self._advance(gen)
+
+    def save_all(self, items: ItemStore) -> List[Dict[str, Any]]:
+        cleaned = sanitize_items(items)
+        with self._connect() as con:
+            gen = self._bump_generation(con)
+            con.execute("DELETE FROM items")
+            con.execute("DELETE FROM comments")
+            con.execute("DELETE FROM attachments")
+            for it in cleaned:
+                self._insert_item(con, it)
+        self._advance(gen)
+        return cleaned
+
+    def save_items(self, items: ItemStore, item_ids):
+        """Rewrite just these items' rows, each guarded by its version. An item another process
+           changed since we loaded it is left alone and reloaded; the migration reruns on a later load."""
+        stale = []
+        with items.lock:
+            with self._connect() as con:
+                gen = self._bump_generation(con)
+                for item_id in item_ids:
+                    it = items.get(item_id)
+                    if it is None:
+                        continue
+                    expected = it.get("version", 0)
+                    if con.execute("DELETE FROM items WHERE id = ? AND version = ?", (item_id, expected)).rowcount == 0:
+                        stale.append(item_id)
+                        continue
+                    for table in ("comments", "attachments"):
+                        con.execute(f"DELETE FROM {table} WHERE item_id = ?", (item_id,))
+                    items.update(it, {"version": expected + 1})
+                    self._insert_item(con, sanitize_items([it])[0])
+            self._advance(gen)
+            if stale:
+                self.reload_items(items, stale)
+
+    def refresh(self, items: ItemStore) -> bool:
+        """One-row generation check; if another process wrote, diff (id, version) pairs and reload
+           only the items that differ."""
+        with items.lock:
+            with self._connect() as con:
+                gen = self._generation(con)
+                if gen == self._seen:
+                    return False
+                stored = dict(con.execute("SELECT id, version FROM items"))
+            changed = [i for i, v in stored.items() if items.get(i) is None or items.get(i).get("version") != v]
+            changed += [it["id"] for it in items if it["id"] not in stored]
+            if changed:
+                self.reload_items(items, changed)
+            self._seen = gen
+        return bool(changed)
+
+    @staticmethod
+    def _generation(con: sqlite3.Connection) -> int:
+        row = con.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _bump_generation(self, con: sqlite3.Connection) -> int:
+        # first statement of the write transaction, so it also takes the write lock
+        con.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+        return self._generation(con)
+
+    def _advance(self, gen: int):
+        """After our own commit: if it was the only write since we last looked, we're still current."""
+        if self._seen is not None and gen == self._seen + 1:
+            self._seen = gen
+
+    def _insert_item(self, con: sqlite3.Connection, it: Dict[str, Any]):
+        con.execute(
+            f"INSERT OR REPLACE INTO items ({','.join(ITEM_COLUMNS)}) VALUES ({','.join('?' * len(ITEM_COLUMNS))})",
+            [it.get(k) for k in ITEM_COLUMNS],
+        )
+        for a in it.get("attachments", []) or []:
+            self._insert_attachment(con, it["id"], a)
+        for e in it.get("comment_history", []) or []:
+            self._insert_comment(con, it["id"], e)
+
+    def _insert_attachment(self, con: sqlite3.Connection, item_id: str, a: Dict[str, Any]):
+        con.execute(
+            f"INSERT OR IGNORE INTO attachments (item_id,{','.join(ATTACHMENT_COLUMNS)}) VALUES (?{',?' * len(ATTACHMENT_COLUMNS)})",
+            [item_id] + [a.get(k) for k in ATTACHMENT_COLUMNS],
+        )
+
+    def _insert_comment(self, con: sqlite3.Connection, item_id: str, e: Dict[str, Any]):
+        con.execute(
+            "INSERT INTO comments (item_id,actor,comment,at,attachment_ids) VALUES (?,?,?,?,?)",
+            (item_id, e.get("actor"), e.get("comment"), e.get("at"), json.dumps(e.get("attachment_ids") or [])),
+        )
+
+    def _cas(self, con: sqlite3.Connection, sql: str, params: List[Any], rec: Dict[str, Any]):
+        """Run an UPDATE/DELETE on one item row, guarded by its expected version."""
+        if rec.get("expected") is not None:
+            sql += " AND version = ?"
+            params = list(params) + [rec["expected"]]
+        if con.execute(sql, params).rowcount == 0:
+            raise ConflictError([rec.get("id")])
+
+    def _apply_sql(self, con: sqlite3.Connection, rec: Dict[str, Any]):
+        op = rec.get("op")
+        if op == "create":
+            self._insert_item(con, _coerce_item(rec.get("item") or {}))
+        elif op == "delete":
+            self._cas(con, "DELETE FROM items WHERE id = ?", [rec.get("id")], rec)
+            for table in ("comments", "attachments"):
+                con.execute(f"DELETE FROM {table} WHERE item_id = ?", (rec.get("id"),))
+        elif op == "update":
+            fields = {k: v for k, v in (rec.get("fields") or {}).items() if k in ITEM_COLUMNS and k != "id"}
+            if fields:
+                self._cas(con, f"UPDATE items SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?", list(fields.values()) + [rec.get("id")], rec)
+        elif op == "comment":
+            self._cas(con, "UPDATE items SET updated_at = COALESCE(?, updated_at), version = ? WHERE id = ?", [rec.get("updated_at"), rec.get("version"), rec.get("id")], rec)
+            for a in rec.get("attachments") or []:
+                self._insert_attachment(con, rec.get("id"), a)
+            self._insert_comment(con, rec.get("id"), rec.get("entry") or {})
+
+@st.cache_resource
+def get_storage() -> Storage:
+    return SqliteStorage() if STORAGE_BACKEND == "sqlite" else JsonFileStorage()
+
+def _update_item(items: ItemStore, it: Dict[str, Any], fields: Dict[str, Any]):
+    """Set fields on an item, bump its version and journal just that change (CAS on the old version)."""
+    expected = it.get("version", 0)
+    fields = dict(fields, version=expected + 1)
+    items.update(it, fields)
+    persist_delta(items, [{"op": "update", "id": it["id"], "fields": fields, "expected": expected}])
 
 # -------------------------
 # Normalize / sanitize
 # -------------------------
-def _coerce_attachment(a, item_id: str):
+def _stable_attachment_id(item_id: str, a, idx: int) -> str:
+    """Deterministic id for a legacy attachment that has none: derived from its content (blob hash,
+       path or inline payload) plus its position, so re-normalizing always yields the same id."""
+    if isinstance(a, str):
+        key = f"path:{a}"
+    elif a.get("sha256"):
+        key = f"sha256:{a['sha256']}"
+    elif a.get("path"):
+        key = f"path:{a['path']}"
+    elif a.get("data"):
+        key = "data:" + hashlib.sha256(str(a["data"]).encode("utf-8")).hexdigest()
+    else:
+        key = f"name:{a.get('name', '')}"
+    return f"{item_id}_{hashlib.sha1(f'{key}#{idx}'.encode('utf-8')).hexdigest()[:32]}"
+
+def _coerce_attachment(a, item_id: str, idx: int = 0):
     """Normalize a single attachment entry to dict form:
-       - if string path -> {'name': Path(...).name, 'path': ..., 'data': None}
-       - if dict with data -> ensure keys exist
+       - if string path -> {'id','name','mime': None,'sha256': None,'size': None,'path': ...}
+       - if dict -> {'id','name','mime','sha256','size'}; legacy 'data'/'path' kept only until migrated
+       idx is the entry's position in its list; it only feeds the id of legacy entries without one.
     """
     if isinstance(a, str):
-        return {"id": f"{item_id}_{uuid.uuid4().hex}", "name": Path(a).name, "mime": None, "data": None, "path": a}
+        return {"id": _stable_attachment_id(item_id, a, idx), "name": Path(a).name, "mime": None, "sha256": None, "size": None, "path": a}
     if isinstance(a, dict):
-        return {
-            "id": a.get("id", f"{item_id}_{uuid.uuid4().hex}"),
+        out = {
+            "id": a.get("id") or _stable_attachment_id(item_id, a, idx),
             "name": a.get("name", "") or (Path(a.get("path","")).name if a.get("path") else ""),
             "mime": a.get("mime"),
-            "data": a.get("data"),
-            "path": a.get("path") if a.get("path") else None,
+            "sha256": a.get("sha256"),
+            "size": a.get("size"),
         }
+        if not out["sha256"]:
+            if a.get("data"):
+                out["data"] = a["data"]
+            if a.get("path"):
+                out["path"] = a["path"]
+        return out
     return None
 
+def _migrate_attachment(a: Dict[str, Any]) -> bool:
+    """Move a legacy inline/path attachment into the blob store in place. Returns True if changed."""
+    if not isinstance(a, dict) or a.get("sha256"):
+        return False
+    if a.get("data"):
+        try:
+            data = base64.b64decode(a["data"])
+        except Exception:
+            return False
+    elif a.get("path") and Path(a["path"]).is_file():
+        data = _read_file_bytes(a)
+    else:
+        return False
+    a["sha256"] = put_blob(data)
+    a["size"] = len(data)
+    if not a.get("mime"):
+        a["mime"] = mimetypes.guess_type(a.get("name") or "")[0] or "application/octet-stream"
+    a.pop("data", None)
+    a.pop("path", None)
+    return True
+
+def migrate_inline_attachments(items: List[Dict[str, Any]], changed_ids: Optional[set] = None) -> int:
+    """Move every inline base64 (or legacy on-disk path) attachment into the blob store.
+       Returns the number of attachments migrated; ids of the items touched are added to changed_ids."""
+    n = 0
+    for it in items:
+        before = n
+        for a in it.get("attachments", []) or []:
+            n += _migrate_attachment(a)
+        for e in it.get("comment_history", []) or []:
+            for a in e.get("attachments", []) or []:
+                n += _migrate_attachment(a)
+        if changed_ids is not None and n > before:
+            changed_ids.add(it["id"])
+    return n
+
+def collapse_comment_attachments(items: List[Dict[str, Any]], changed_ids: Optional[set] = None) -> int:
+    """Replace attachment copies embedded in comment entries with references (attachment_ids)
+       to the item-level record, adding the record to the item if it was only stored on the entry.
+       Item-level duplicates of one upload (same content and name under different ids, e.g. the old
+       edit form encoding a file twice) are merged into the first record and references remapped.
+       Run after migrate_inline_attachments so content is compared by blob hash.
+       Returns the number of entries rewritten plus duplicate records dropped; ids of the items
+       touched are added to changed_ids."""
+    def content_key(a):
+        return (a.get("sha256") or a.get("path"), a.get("name"))
+
+    n = 0
+    for it in items:
+        before = n
+        item_atts = it.setdefault("attachments", [])
+        by_id: Dict[str, Dict[str, Any]] = {}
+        by_content: Dict[tuple, Dict[str, Any]] = {}
+        remap: Dict[str, str] = {}
+        kept = []
+        for a in item_atts:
+            if isinstance(a, dict) and (a.get("sha256") or a.get("path")):
+                canonical = by_content.setdefault(content_key(a), a)
+                if canonical is not a:
+                    remap[a.get("id")] = canonical["id"]
+                    n += 1
+                    continue
+            if isinstance(a, dict) and a.get("id"):
+                by_id[a["id"]] = a
+            kept.append(a)
+        if remap:
+            item_atts[:] = kept
+        for e in it.get("comment_history", []) or []:
+            legacy = e.pop("attachments", None)
+            ids = e.setdefault("attachment_ids", [])
+            if remap and any(i in remap for i in ids):
+                ids[:] = list(dict.fromkeys(remap.get(i, i) for i in ids))
+            if not legacy:
+                continue
+            for a in legacy:
+                if not isinstance(a, dict):
+                    continue
+                canonical = by_id.get(remap.get(a.get("id"), a.get("id"))) or by_content.get(content_key(a))
+                if canonical is None:
+                    canonical = a
+                    item_atts.append(a)
+                    by_id[a["id"]] = a
+                    if a.get("sha256") or a.get("path"):
+                        by_content[content_key(a)] = a
+                if canonical["id"] not in ids:
+                    ids.append(canonical["id"])
+            n += 1
+        if changed_ids is not None and n > before:
+            changed_ids.add(it["id"])
+    return n
+
 def _coerce_comment_entry(e, item_id: str):
     if not isinstance(e, dict):
         return None
-    attachments = e.get("attachments") or []
-    norm_atts = []
-    for a in attachments:
-        ca = _coerce_attachment(a, item_id)
-        if ca:
-            norm_atts.append(ca)
-    return {
+    out = {
         "actor": str(e.get("actor", "system")),
         "comment": str(e.get("comment", "") or ""),
-        "attachments": norm_atts,
+        "attachment_ids": [str(a) for a in (e.get("attachment_ids") or [])],
         "at": e.get("at") or _now_iso(),
     }
+    # legacy: full attachment copies on the entry (collapsed into attachment_ids by the loader)
+    norm_atts = []
+    for idx, a in enumerate(e.get("attachments") or []):
+        ca = _coerce_attachment(a, item_id, idx)
+        if ca:
+            norm_atts.append(ca)
+    if norm_atts:
+        out["attachments"] = norm_atts
+    return out
+
+def _to_int(v) -> int:
+    try:
+        return int(v or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def _to_float(v) -> float:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return 0.0
+    return f if f == f else 0.0
 
 def _coerce_item(x: Dict[str, Any]) -> Dict[str, Any]:
     # normalize comment history
@@ -152,8 +1193,8 @@ def _coerce_item(x: Dict[str, Any]) -> Dict[str, Any]:
     # normalize attachments at item level
     raw_atts = list(x.get("attachments", []) if isinstance(x, dict) else [])
     norm_atts = []
-    for a in raw_atts:
-        ca = _coerce_attachment(a, item_id)
+    for idx, a in enumerate(raw_atts):
+        ca = _coerce_attachment(a, item_id, idx)
         if ca:
             norm_atts.append(ca)
 
@@ -182,6 +1223,8 @@ def _coerce_item(x: Dict[str, Any]) -> Dict[str, Any]:
         "payment_confirmed_at": x.get("payment_confirmed_at"),
         "comment_history": norm_ch,
         "attachments": norm_atts,
+        "version": _to_int(x.get("version") if isinstance(x, dict) else 0),
+        "schema_version": SCHEMA_VERSION,
     }
     if base["status"] not in STATUSES:
         base["status"] = "ready"
@@ -199,12 +1242,17 @@ def _normalize_loaded(obj) -> List[Dict[str, Any]]:
     return []
 
 def sanitize_items(items) -> List[Dict[str, Any]]:
-    if not isinstance(items, list):
+    # accepts a list or an ItemStore; no isinstance check on ItemStore because the store cached by
+    # get_item_store (st.cache_resource) is an instance of the ItemStore class from an earlier script run
+    try:
+        items = list(items)
+    except TypeError:
         return []
     clean = []
     for it in items:
         if isinstance(it, dict):
-            clean.append(_coerce_item(it))
+            # already normalized (at load or by a flow) -> reuse as-is
+            clean.append(it if it.get("schema_version") == SCHEMA_VERSION else _coerce_item(it))
     return clean
 
 # -------------------------
@@ -236,153 +1284,305 @@ def new_item(title: str, ttype: str, client: str, project: str, billable: bool):
         "payment_requested_at": None,
         "payment_confirmed_at": None,
         "attachments": [],
-        "comment_history": [{"actor": "system", "comment": "Task created", "attachments": [], "at": now}],
+        "comment_history": [{"actor": "system", "comment": "Task created", "attachment_ids": [], "at": now}],
+        "version": 1,
+        "schema_version": SCHEMA_VERSION,
     }
 
-def get_items_by_status(items, status):
-    out = []
-    if not isinstance(items, list):
-        return out
-    for it in items:
-        if isinstance(it, dict) and it.get("status") == status and not it.get("archived", False):
-            out.append(it)
-    return out
+def add_item(items, item: Dict[str, Any]):
+    """Add a new item (from new_item) to the store and persist it."""
+    with get_storage().transaction(items):
+        items.add(item)
+        persist_delta(items, [{"op": "create", "item": item}])
+    return item
+
+def delete_item(items, item_id: str):
+    with get_storage().transaction(items):
+        it = items.remove(item_id)
+        if it is not None:
+            persist_delta(items, [{"op": "delete", "id": item_id, "expected": it.get("version", 0)}])
 
 def append_history(items, item_id: str, actor: str, comment: str, attachment_files: Optional[List[Any]] = None):
-    """Add entry to conversation and persist using save_and_persist.
+    """Add entry to conversation and journal it using persist_delta.
        attachment_files are UploadedFile objects (streamlit) OR legacy dicts/paths.
+       Each file becomes one item-level attachment record; the entry references it by id.
     """
-    for it in items:
-        if isinstance(it, dict) and it.get("id") == item_id:
-            saved_attachments = []
-            if attachment_files:
-                for f in attachment_files:
-                    if f is None:
-                        continue
-                    # If it's an UploadedFile (has .getbuffer), encode to base64 dict
-                    if hasattr(f, "getbuffer"):
-                        enc = _encode_uploaded_file_to_b64(f, item_id)
-                        saved_attachments.append(enc)
-                        it.setdefault("attachments", []).append(enc)
-                    # If it's already an attachment dict or path string
-                    elif isinstance(f, dict) or isinstance(f, str):
-                        ca = _coerce_attachment(f, item_id)
-                        if ca:
-                            saved_attachments.append(ca)
-                            it.setdefault("attachments", []).append(ca)
-            entry = {
-                "actor": actor,
-                "comment": str(comment or ""),
-                "attachments": saved_attachments,
-                "at": _now_iso(),
-            }
-            it.setdefault("comment_history", []).append(entry)
-            it["updated_at"] = _now_iso()
-            save_and_persist(items)
-            return it
-    return None
+    with get_storage().transaction(items):
+        it = items.get(item_id)
+        if it is None:
+            return None
+        saved_ids = []
+        if attachment_files:
+            for f in attachment_files:
+                if f is None:
+                    continue
+                # If it's an UploadedFile (has .getbuffer), put it in the blob store
+                if hasattr(f, "getbuffer"):
+                    ca = _store_uploaded_file(f, item_id)
+                # If it's already an attachment dict or path string
+                elif isinstance(f, dict) or isinstance(f, str):
+                    ca = _coerce_attachment(f, item_id, len(it.get("attachments", [])))
+                else:
+                    ca = None
+                if ca:
+                    it.setdefault("attachments", []).append(ca)
+                    saved_ids.append(ca["id"])
+        entry = {
+            "actor": actor,
+            "comment": str(comment or ""),
+            "attachment_ids": saved_ids,
+            "at": _now_iso(),
+        }
+        it.setdefault("comment_history", []).append(entry)
+        it["updated_at"] = _now_iso()
+        expected = it.get("version", 0)
+        it["version"] = expected + 1
+        items.touch()
+        new_atts = [a for a in it.get("attachments", []) if a.get("id") in saved_ids]
+        persist_delta(items, [{
+            "op": "comment", "id": item_id, "entry": entry, "attachments": new_atts,
+            "updated_at": it["updated_at"], "version": it["version"], "expected": expected,
+        }])
+        return it
 
 def developer_complete(items, item_id: str, hours: float, rate: float, dev_comment: str, dev_files: Optional[List[Any]] = None):
     """Developer completes task: must provide hours + comment (attachments optional).
        Task becomes completed and visible to client as Needs Approval (not archived)."""
-    for it in items:
-        if isinstance(it, dict) and it.get("id") == item_id:
-            it["hours"] = float(hours)
-            it["rate_at_completion"] = float(rate)
-            it["amount"] = round(float(hours) * float(rate), 2)
-            it["status"] = "completed"
-            it["completed_at"] = _now_iso()
-            it["updated_at"] = _now_iso()
-            it["archived"] = False
-            it["needs_client_approval"] = True
-            it["client_approved"] = False
-            # append dev comment and persist (this will also attach files)
-            append_history(items, item_id, "dev", dev_comment or "", dev_files)
-            save_and_persist(items)
-            return it
-    return None
+    with get_storage().transaction(items):
+        it = items.get(item_id)
+        if it is None:
+            return None
+        _update_item(items, it, {
+            "hours": float(hours),
+            "rate_at_completion": float(rate),
+            "amount": round(float(hours) * float(rate), 2),
+            "status": "completed",
+            "completed_at": _now_iso(),
+            "updated_at": _now_iso(),
+            "archived": False,
+            "needs_client_approval": True,
+            "client_approved": False,
+        })
+        # append dev comment and persist (this will also attach files)
+        append_history(items, item_id, "dev", dev_comment or "", dev_files)
+        return it
 
 def client_approve(items, item_id: str):
     """Client approves: mark approved (keeps in completed list)"""
-    for it in items:
-        if isinstance(it, dict) and it.get("id") == item_id:
-            it["client_approved"] = True
-            it["needs_client_approval"] = False
-            append_history(items, item_id, "client", "Approved", None)
-            it["updated_at"] = _now_iso()
-            save_and_persist(items)
-            return it
-    return None
+    with get_storage().transaction(items):
+        it = items.get(item_id)
+        if it is None:
+            return None
+        _update_item(items, it, {"client_approved": True, "needs_client_approval": False, "updated_at": _now_iso()})
+        append_history(items, item_id, "client", "Approved", None)
+        return it
 
 def client_request_changes(items, item_id: str, comment: str, files: Optional[List[Any]] = None):
     """Client requests changes: set review_requested and send back to developer (inprogress)"""
-    for it in items:
-        if isinstance(it, dict) and it.get("id") == item_id:
-            it["review_requested"] = True
-            it["needs_client_approval"] = False
-            it["client_approved"] = False
-            it["status"] = "inprogress"
-            append_history(items, item_id, "client", comment or "", files)
-            it["updated_at"] = _now_iso()
-            save_and_persist(items)
-            return it
-    return None
+    with get_storage().transaction(items):
+        it = items.get(item_id)
+        if it is None:
+            return None
+        _update_item(items, it, {
+            "review_requested": True,
+            "needs_client_approval": False,
+            "client_approved": False,
+            "status": "inprogress",
+            "updated_at": _now_iso(),
+        })
+        append_history(items, item_id, "client", comment or "", files)
+        return it
 
 def developer_respond_changes(items, item_id: str, comment: str, files: Optional[List[Any]] = None, hours: Optional[float] = None, rate: Optional[float] = None):
     """Developer responds to change request: append comment, may update hours/rate, then mark completed again and set needs_client_approval True."""
-    for it in items:
-        if isinstance(it, dict) and it.get("id") == item_id:
-            append_history(items, item_id, "dev", comment or "", files)
-            if hours is not None:
-                try:
-                    it["hours"] = float(hours)
-                except Exception:
-                    pass
-            if rate is not None:
-                try:
-                    it["rate_at_completion"] = float(rate)
-                except Exception:
-                    pass
-            if it.get("hours") is not None and it.get("rate_at_completion") is not None:
-                try:
-                    it["amount"] = round(float(it["hours"]) * float(it["rate_at_completion"]), 2)
-                except Exception:
-                    pass
-            it["status"] = "completed"
-            it["completed_at"] = _now_iso()
-            it["review_requested"] = False
-            it["needs_client_approval"] = True
-            it["client_approved"] = False
-            it["updated_at"] = _now_iso()
-            save_and_persist(items)
-            return it
-    return None
+    with get_storage().transaction(items):
+        it = items.get(item_id)
+        if it is None:
+            return None
+        append_history(items, item_id, "dev", comment or "", files)
+        fields = {}
+        if hours is not None:
+            try:
+                fields["hours"] = float(hours)
+            except Exception:
+                pass
+        if rate is not None:
+            try:
+                fields["rate_at_completion"] = float(rate)
+            except Exception:
+                pass
+        h = fields.get("hours", it.get("hours"))
+        r = fields.get("rate_at_completion", it.get("rate_at_completion"))
+        if h is not None and r is not None:
+            try:
+                fields["amount"] = round(float(h) * float(r), 2)
+            except Exception:
+                pass
+        fields.update({
+            "status": "completed",
+            "completed_at": _now_iso(),
+            "review_requested": False,
+            "needs_client_approval": True,
+            "client_approved": False,
+            "updated_at": _now_iso(),
+        })
+        _update_item(items, it, fields)
+        return it
 
 def client_mark_paid(items, ids: List[str]):
     """Client marks tasks as paid — sets payment_requested flag and timestamp."""
-    for it in items:
-        if isinstance(it, dict) and it.get("id") in ids:
-            it["payment_requested"] = True
-            it["payment_requested_at"] = _now_iso()
+    with get_storage().transaction(items):
+        for item_id in dict.fromkeys(ids):
+            it = items.get(item_id)
+            if it is None:
+                continue
+            _update_item(items, it, {"payment_requested": True, "payment_requested_at": _now_iso()})
             append_history(items, it["id"], "client", "Marked as Paid (client)", None)
-    save_and_persist(items)
 
 def developer_confirm_payment(items, ids: List[str]):
     """Developer confirms payment: mark payment_confirmed_by_dev True and archive tasks (history)."""
-    for it in items:
-        if isinstance(it, dict) and it.get("id") in ids:
-            it["payment_confirmed_by_dev"] = True
-            it["payment_confirmed_at"] = _now_iso()
-            it["archived"] = True  # move to history
+    with get_storage().transaction(items):
+        for item_id in dict.fromkeys(ids):
+            it = items.get(item_id)
+            if it is None:
+                continue
+            _update_item(items, it, {
+                "payment_confirmed_by_dev": True,
+                "payment_confirmed_at": _now_iso(),
+                "archived": True,  # move to history
+            })
             append_history(items, it["id"], "dev", "Confirmed receipt of payment", None)
-    save_and_persist(items)
+
+# -------------------------
+# Bulk import (CSV / XLSX)
+# -------------------------
+# columns an import may set (the flat export's columns, so an exported CSV re-imports); anything
+# else, including id, is ignored and every row becomes a new item
+IMPORT_FIELDS = [
+    "type","title","client","project","billable","status","hours","rate_at_completion","amount",
+    "created_at","updated_at","completed_at","archived","needs_client_approval","client_approved",
+    "review_requested","payment_requested","payment_confirmed_by_dev","payment_requested_at","payment_confirmed_at",
+]
+IMPORT_FLOAT_FIELDS = {"hours", "rate_at_completion", "amount"}
+IMPORT_TIME_FIELDS = {"created_at", "updated_at", "completed_at", "payment_requested_at", "payment_confirmed_at"}
+
+def iter_import_rows(f, name: str):
+    """Yield (row number, {header: value}) per non-blank data row of a CSV or XLSX file object,
+       without loading the whole sheet (openpyxl read-only mode for .xlsx). The number is the sheet
+       row / the CSV line the record starts on, so error messages point at the right place."""
+    if name.lower().endswith((".xlsx", ".xlsm")):
+        if openpyxl is None:
+            raise ValueError("XLSX import needs openpyxl")
+        wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows()
+            header = [str(c.value or "").strip() for c in next(rows, [])]
+            for cells in rows:
+                values = [c.value for c in cells]
+                if any(v not in (None, "") for v in values):
+                    # blank cells (EmptyCell) carry no row number; a non-blank row has a real one
+                    row_no = next(c.row for c in cells if getattr(c, "row", None))
+                    yield row_no, dict(zip(header, values))
+        finally:
+            wb.close()
+    else:
+        reader = csv.reader(io.TextIOWrapper(f, encoding="utf-8-sig", newline=""))
+        header = next(reader, [])
+        while True:
+            line_no = reader.line_num + 1
+            values = next(reader, None)
+            if values is None:
+                break
+            if any(v.strip() for v in values):
+                yield line_no, dict(zip(header, values))
+
+def _parse_import_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a raw spreadsheet row onto item fields; raises ValueError on an invalid value."""
+    raw = {str(k or "").strip().lower().replace(" ", "_"): v for k, v in row.items()}
+    out: Dict[str, Any] = {}
+    for field in IMPORT_FIELDS:
+        v = raw.get(field)
+        if isinstance(v, str):
+            v = v.strip()
+        if v is None or v == "":
+            continue
+        if field in BOOL_COLUMNS:
+            if isinstance(v, str):
+                if v.lower() not in ("true", "false", "yes", "no", "y", "n", "1", "0", "x"):
+                    raise ValueError(f"{field}: expected yes/no, got {v!r}")
+                v = v.lower() in ("true", "yes", "y", "1", "x")
+            v = bool(v)
+        elif field in IMPORT_FLOAT_FIELDS:
+            try:
+                v = float(v)
+            except (TypeError, ValueError):
+                raise ValueError(f"{field}: not a number: {v!r}")
+        elif field in IMPORT_TIME_FIELDS:
+            v = v.isoformat() if isinstance(v, (datetime, date)) else str(v)
+        else:
+            v = str(v)
+        out[field] = v
+    if not out.get("title"):
+        raise ValueError("title is required")
+    out["type"] = out.get("type", TYPE_OPTIONS[0]).lower()
+    if out["type"] not in TYPE_OPTIONS:
+        raise ValueError(f"type must be one of {', '.join(TYPE_OPTIONS)}")
+    if "status" in out:
+        out["status"] = out["status"].lower()
+        if out["status"] not in STATUSES:
+            raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+    return out
+
+def import_items(items, rows) -> tuple:
+    """Validate rows through the same rules as loaded data (_coerce_item) and add the valid ones
+       as new items in a single transaction (one persisted batch). rows are (row number, dict) pairs
+       as yielded by iter_import_rows. Returns (added, [(row no, error)])."""
+    new, errors = [], []
+    for n, row in rows:
+        try:
+            fields = _parse_import_row(row)
+        except ValueError as e:
+            errors.append((n, str(e)))
+            continue
+        item = new_item(fields["title"], fields["type"], fields.get("client", ""), fields.get("project", ""), fields.get("billable", True))
+        item.update(fields)
+        new.append(_coerce_item(item))
+    if new:
+        with get_storage().transaction(items):
+            for item in new:
+                add_item(items, item)
+    return len(new), errors
+
+def _import_cli(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="dashboard.py import", description="Bulk-import tasks from CSV or XLSX files.")
+    parser.add_argument("files", nargs="+", type=Path)
+    args = parser.parse_args(argv)
+    items = get_item_store()
+    status = 0
+    for path in args.files:
+        with open(path, "rb") as f:
+            added, errors = import_items(items, iter_import_rows(f, path.name))
+        print(f"{path}: imported {added} task(s), skipped {len(errors)} row(s)")
+        for n, err in errors:
+            print(f"  row {n}: {err}", file=sys.stderr)
+        status = status or (1 if errors else 0)
+    return status
+
+# `python dashboard.py import FILE...` (outside `streamlit run`)
+if __name__ == "__main__" and not st.runtime.exists() and sys.argv[1:2] == ["import"]:
+    sys.exit(_import_cli(sys.argv[2:]))
 
 # -------------------------
 # Session init & defaults
 # -------------------------
-if STATE_KEY not in st.session_state:
-    st.session_state[STATE_KEY] = load_data()
-st.session_state[STATE_KEY] = sanitize_items(st.session_state[STATE_KEY])
+# one process-wide store shared by every session: loaded and normalized once, then kept normalized
+# by the flows, so reruns (and additional sessions) reuse it as-is
+items_store = get_item_store()
+# pick up edits persisted by other processes since the last rerun (a stat/one-row query if none)
+get_storage().refresh(items_store)
+
+if st.session_state.get("flash"):
+    st.warning(st.session_state.pop("flash"))
 
 if "billing_hourly_rate" not in st.session_state:
     st.session_state.billing_hourly_rate = 75.0
@@ -477,15 +1677,27 @@ if page == "developer":
             else:
                 item = new_item(title, ttype, client_name, project, billable)
                 if files:
-                    saved_paths = []
+                    saved_ids = []
                     for f in files:
-                        enc = _encode_uploaded_file_to_b64(f, item["id"])
-                        saved_paths.append(enc)
+                        enc = _store_uploaded_file(f, item["id"])
+                        saved_ids.append(enc["id"])
                         item.setdefault("attachments", []).append(enc)
-                    item.setdefault("comment_history", []).append({"actor": "dev", "comment": "Initial attachments", "attachments": saved_paths, "at": _now_iso()})
-                st.session_state[STATE_KEY].append(item)
-                save_and_persist(st.session_state[STATE_KEY])
+                    item.setdefault("comment_history", []).append({"actor": "dev", "comment": "Initial attachments", "attachment_ids": saved_ids, "at": _now_iso()})
+                add_item(items_store, item)
                 st.sidebar.success("Task created.")
+    st.sidebar.markdown("---")
+    with st.sidebar.expander("📥 Bulk import (CSV / XLSX)"):
+        st.caption("One task per row; header row with columns like title, type, client, project, billable, status, hours.")
+        upload = st.file_uploader("File", type=["csv", "xlsx"] if openpyxl is not None else ["csv"], key="bulk_import_file")
+        if upload is not None and st.button("Import", key="bulk_import_go"):
+            try:
+                added, errors = import_items(items_store, iter_import_rows(upload, upload.name))
+            except Exception as e:
+                st.error(f"Import failed: {e}")
+            else:
+                st.success(f"Imported {added} task(s).")
+                if errors:
+                    st.warning(f"Skipped {len(errors)} invalid row(s):\n" + "\n".join(f"- row {n}: {err}" for n, err in errors[:20]))
 elif page == "client":
     # Client sidebar: only Add Task (as requested)
     st.sidebar.header("➕ Client: Add Task / Defect")
@@ -502,111 +1714,276 @@ elif page == "client":
             else:
                 item = new_item(title, ttype, "Client", project, billable)
                 if files:
-                    saved_paths = []
+                    saved_ids = []
                     for f in files:
-                        enc = _encode_uploaded_file_to_b64(f, item["id"])
-                        saved_paths.append(enc)
+                        enc = _store_uploaded_file(f, item["id"])
+                        saved_ids.append(enc["id"])
                         item.setdefault("attachments", []).append(enc)
-                    item.setdefault("comment_history", []).append({"actor": "client", "comment": "Initial attachments", "attachments": saved_paths, "at": _now_iso()})
-                st.session_state[STATE_KEY].append(item)
-                save_and_persist(st.session_state[STATE_KEY])
+                    item.setdefault("comment_history", []).append({"actor": "client", "comment": "Initial attachments", "attachment_ids": saved_ids, "at": _now_iso()})
+                add_item(items_store, item)
                 st.sidebar.success("Task created.")
 
-# Build df_all for tables
-items_list = sanitize_items(st.session_state[STATE_KEY])
-df_all = pd.DataFrame(items_list) if items_list else pd.DataFrame(columns=[
-    "id","type","title","client","project","billable","status","hours","rate_at_completion","amount","created_at","updated_at","completed_at","archived",
-    "needs_client_approval","client_approved","review_requested","payment_requested","payment_confirmed_by_dev","comment_history","attachments"
-])
+# Build df_all for tables: scalar columns only, nested comment_history / attachments reduced to
+# counts (the full records go out through the JSON export)
+TABLE_COLUMNS = [c for c in ITEM_COLUMNS if c != "version"] + ["comment_count", "attachment_count", "last_comment_at"]
+DATETIME_COLUMNS = ["created_at", "updated_at", "completed_at", "payment_requested_at", "payment_confirmed_at", "last_comment_at"]
+FLOAT_COLUMNS = ["hours", "rate_at_completion", "amount"]
+
+def _to_datetime(col: pd.Series) -> pd.Series:
+    try:
+        return pd.to_datetime(col, errors="coerce", format="ISO8601")
+    except (ValueError, TypeError):
+        # mixed naive / offset-aware timestamps: normalize everything to UTC
+        return pd.to_datetime(col, errors="coerce", format="ISO8601", utc=True)
+
+def _table_row(it: Dict[str, Any]) -> Dict[str, Any]:
+    row = {k: it.get(k) for k in ITEM_COLUMNS if k != "version"}
+    history = it.get("comment_history") or []
+    row["comment_count"] = len(history)
+    row["attachment_count"] = len(it.get("attachments") or [])
+    row["last_comment_at"] = max((e.get("at") or "" for e in history), default="") or None
+    return row
+
+def items_table(items) -> pd.DataFrame:
+    df = pd.DataFrame([_table_row(it) for it in items], columns=TABLE_COLUMNS)
+    for c in DATETIME_COLUMNS:
+        df[c] = _to_datetime(df[c])
+    for c in FLOAT_COLUMNS:
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype("float64")
+    for c in BOOL_COLUMNS:
+        df[c] = df[c].fillna(False).astype(bool)
+    for c in ("comment_count", "attachment_count"):
+        df[c] = df[c].astype("int64")
+    return df
+
+@st.cache_resource(max_entries=8)
+def cached_items_table(store_id: int, generation: int, bucket: Optional[str], _items) -> pd.DataFrame:
+    """items_table of the whole store (or one bucket), built once per store generation and shared by
+       every session; reruns that didn't change any data reuse it. Treat the result as read-only."""
+    return items_table(_items.bucket(bucket) if bucket else list(_items))
+
+df_all = cached_items_table(id(items_store), items_store.generation, None, items_store)
 
 # -------------------------
-# Download helpers (CSV + JSON)
+# Download helpers (CSV + JSON + NDJSON)
 # -------------------------
-def render_download_buttons(df: pd.DataFrame, key_prefix: str = "all"):
-    """Render CSV download button and JSON download button side-by-side."""
-    if df is None or df.empty:
+# fmt -> (file extension, mime type)
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "json": ("json", "application/json"),
+    "ndjson": ("ndjson", "application/x-ndjson"),
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+EXPORT_DIR = Path(tempfile.gettempdir()) / "task_dashboard_exports"
+
+def _write_export(f, items, fmt: str):
+    """Stream items into the text file f one record at a time: "csv" is the flat table, "json" /
+       "ndjson" the full nested records."""
+    if fmt == "csv":
+        writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS)
+        writer.writeheader()
+        for it in items:
+            writer.writerow(_table_row(it))
+    elif fmt == "ndjson":
+        for it in items:
+            f.write(json.dumps(it, ensure_ascii=False, default=str) + "\n")
+    else:
+        f.write("[")
+        for i, it in enumerate(items):
+            f.write(("," if i else "") + "\n" + json.dumps(it, indent=2, ensure_ascii=False, default=str))
+        f.write("\n]\n")
+
+BILLING_COLUMNS = [
+    # (header, item field, column width)
+    ("Completed", "completed_at", 18), ("Title", "title", 40), ("Type", "type", 8), ("Project", "project", 18),
+    ("Billable", "billable", 9), ("Status", "status", 11), ("Hours", "hours", 9),
+    ("Rate", "rate_at_completion", 9), ("Amount", "amount", 12),
+]
+
+def _sheet_name(name: str, used: set) -> str:
+    """Excel-safe worksheet name: no []:*?/\\, at most 31 chars, unique (case-insensitively)."""
+    base = "".join("_" if ch in "[]:*?/\\" else ch for ch in (name or "(no client)")).strip("'")[:31] or "(no client)"
+    candidate, n = base, 1
+    while candidate.lower() in used:
+        n += 1
+        candidate = f"{base[:31 - len(str(n)) - 1]}~{n}"
+    used.add(candidate.lower())
+    return candidate
+
+def write_billing_workbook(items: List[Dict[str, Any]], path: Path):
+    """One sheet per client with its completed / archived tasks (by completion date) and a totals
+       row, plus a Totals sheet. xlsxwriter's constant_memory mode flushes each row as it's written,
+       so only the item references grouped by client are held in memory."""
+    by_client: Dict[str, List[Dict[str, Any]]] = {}
+    for it in filter(BUCKETS["completed_or_archived"], items):
+        by_client.setdefault(it.get("client") or "", []).append(it)
+
+    # text is user-entered: never turn it into live formulas or hyperlinks
+    wb = xlsxwriter.Workbook(str(path), {"constant_memory": True, "strings_to_formulas": False, "strings_to_urls": False})
+    bold = wb.add_format({"bold": True})
+    when = wb.add_format({"num_format": "yyyy-mm-dd hh:mm"})
+    money = wb.add_format({"num_format": "#,##0.00"})
+    bold_money = wb.add_format({"bold": True, "num_format": "#,##0.00"})
+    hours_col = [f for _, f, _ in BILLING_COLUMNS].index("hours")
+    amount_col = [f for _, f, _ in BILLING_COLUMNS].index("amount")
+    totals_ws = wb.add_worksheet("Totals")  # first tab, filled in last (its own rows are still in order)
+    used = {"totals"}
+    totals = []
+    for client in sorted(by_client, key=str.lower):
+        ws = wb.add_worksheet(_sheet_name(client, used))
+        for col, (header, _, width) in enumerate(BILLING_COLUMNS):
+            ws.set_column(col, col, width)
+            ws.write(0, col, header, bold)
+        hours = amount = billable_amount = 0.0
+        rows = sorted(by_client[client], key=lambda it: it.get("completed_at") or "")
+        for r, it in enumerate(rows, start=1):
+            for col, (_, field, _) in enumerate(BILLING_COLUMNS):
+                v = it.get(field)
+                if field == "completed_at" and v:
+                    try:
+                        ws.write_datetime(r, col, datetime.fromisoformat(v).replace(tzinfo=None), when)
+                        continue
+                    except ValueError:
+                        pass
+                if isinstance(v, float) and v != v:  # NaN
+                    v = None
+                ws.write(r, col, v, money if field in ("rate_at_completion", "amount") else None)
+            h, a = _to_float(it.get("hours")), _to_float(it.get("amount"))
+            hours += h
+            amount += a
+            billable_amount += a if it.get("billable") else 0.0
+        last = len(rows) + 1
+        ws.write(last, 0, "Total", bold)
+        ws.write_formula(last, hours_col, f"=SUM({xlsxwriter.utility.xl_rowcol_to_cell(1, hours_col)}:{xlsxwriter.utility.xl_rowcol_to_cell(last - 1, hours_col)})", bold, hours)
+        ws.write_formula(last, amount_col, f"=SUM({xlsxwriter.utility.xl_rowcol_to_cell(1, amount_col)}:{xlsxwriter.utility.xl_rowcol_to_cell(last - 1, amount_col)})", bold_money, amount)
+        totals.append((client, len(rows), hours, amount, billable_amount))
+
+    for col, header in enumerate(["Client", "Tasks", "Hours", "Amount", "Billable amount"]):
+        totals_ws.set_column(col, col, 24 if col == 0 else 14)
+        totals_ws.write(0, col, header, bold)
+    for r, (client, n, hours, amount, billable_amount) in enumerate(totals, start=1):
+        totals_ws.write_row(r, 0, [client or "(no client)", n, hours])
+        totals_ws.write(r, 3, amount, money)
+        totals_ws.write(r, 4, billable_amount, money)
+    grand = len(totals) + 1
+    totals_ws.write(grand, 0, "Total", bold)
+    totals_ws.write_row(grand, 1, [sum(t[1] for t in totals), sum(t[2] for t in totals)], bold)
+    totals_ws.write(grand, 3, sum(t[3] for t in totals), bold_money)
+    totals_ws.write(grand, 4, sum(t[4] for t in totals), bold_money)
+    wb.close()
+
+def export_file(items: ItemStore, fmt: str, compress: bool = False) -> Path:
+    """Export file for the store's current generation, written once (optionally gzipped) into
+       EXPORT_DIR and reused until the data changes; older generations' files are removed."""
+    compress = compress and fmt != "xlsx"  # already a zip
+    ext = EXPORT_FORMATS[fmt][0] + (".gz" if compress else "")
+    stem = f"tasks_{os.getpid()}_{id(items)}"
+    path = EXPORT_DIR / f"{stem}_{items.generation}.{ext}"
+    if path.exists():
+        return path
+    # runs on the download thread: snapshot under the lock so a concurrent session's transaction
+    # can't change items halfway through (shallow copies; the file is named after this generation)
+    with items.lock:
+        path = EXPORT_DIR / f"{stem}_{items.generation}.{ext}"
+        snapshot = [dict(it) for it in items]
+    EXPORT_DIR.mkdir(exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    if fmt == "xlsx":
+        write_billing_workbook(snapshot, tmp)
+    else:
+        with (gzip.open if compress else open)(tmp, "wt", encoding="utf-8", newline="") as f:
+            _write_export(f, snapshot, fmt)
+    os.replace(tmp, path)
+    for old in EXPORT_DIR.glob(f"{stem}_*.{ext}"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+def render_download_buttons(items: ItemStore, key_prefix: str = "all"):
+    """Render CSV, JSON and NDJSON download buttons side-by-side, plus the per-client billing
+       workbook. A file is only written when its button is clicked (and then reused until the data changes)."""
+    if not len(items):
         return
-    # Prepare CSV bytes
-    try:
-        csv_bytes = df.to_csv(index=False).encode("utf-8")
-    except Exception:
-        csv_bytes = "".encode("utf-8")
-    # Prepare JSON bytes (use orient records for readable list-of-objects)
-    try:
-        json_records = df.to_dict(orient="records")
-        json_bytes = json.dumps(json_records, indent=2, ensure_ascii=False).encode("utf-8")
-    except Exception:
-        try:
-            json_bytes = json.dumps(df.to_dict(orient="records"), indent=2, ensure_ascii=False).encode("utf-8")
-        except Exception:
-            json_bytes = "[]".encode("utf-8")
+    compress = st.checkbox("gzip", key=f"dl_gzip_{key_prefix}")
+    suffix = ".gz" if compress else ""
 
-    c1, c2 = st.columns([1,1])
-    # CSV download first
-    with c1:
-        st.download_button(
-            label="⬇ Download CSV",
-            data=csv_bytes,
-            file_name=f"tasks_{key_prefix}.csv",
-            mime="text/csv",
-            key=f"dl_csv_{key_prefix}"
-        )
-    # JSON download immediately after CSV (icon right after)
-    with c2:
+    c1, c2, c3 = st.columns([1,1,1])
+    for col, fmt, label in ((c1, "csv", "⬇ Download CSV"), (c2, "json", "🗒️ Download JSON"), (c3, "ndjson", "🗒️ Download NDJSON")):
+        ext, mime = EXPORT_FORMATS[fmt]
+        with col:
+            st.download_button(
+                label=label,
+                data=lambda fmt=fmt: export_file(items, fmt, compress).read_bytes(),
+                file_name=f"tasks_{key_prefix}.{ext}{suffix}",
+                mime="application/gzip" if compress else mime,
+                key=f"dl_{fmt}_{key_prefix}"
+            )
+    if xlsxwriter is not None:
         st.download_button(
-            label="🗒️ Download JSON",
-            data=json_bytes,
-            file_name=f"tasks_{key_prefix}.json",
-            mime="application/json",
-            key=f"dl_json_{key_prefix}"
+            label="📊 Download billing workbook (Excel, one sheet per client)",
+            data=lambda: export_file(items, "xlsx").read_bytes(),
+            file_name=f"billing_{key_prefix}.xlsx",
+            mime=EXPORT_FORMATS["xlsx"][1],
+            key=f"dl_xlsx_{key_prefix}"
         )
 
 # -------------------------
 # UI Helpers: attachments & conversation history
 # -------------------------
+def _is_image(mime: Optional[str], name: str) -> bool:
+    return (mime or mimetypes.guess_type(name)[0] or "").startswith("image/")
+
 def render_attachments_list(attachments: List[Any], key_prefix: str):
+    """Images show as cached thumbnails (full size on request); downloads read bytes when clicked."""
     if not attachments:
         return
     for idx, a in enumerate(attachments):
         try:
-            # a may be dict with 'data' or legacy path string
+            # a may be a blob-store dict or legacy path string
             if isinstance(a, dict):
-                data = _read_file_bytes(a)
                 name = a.get("name") or f"attachment_{idx}"
-                # try to display if image-like
-                try:
-                    st.image(data, caption=name, use_column_width=False)
-                except Exception:
+                if _is_image(a.get("mime"), name):
+                    thumb = get_thumbnail(a["sha256"]) if a.get("sha256") else None
+                    full = thumb is None or st.toggle("Full size", key=f"full_{key_prefix}_{a.get('id', idx)}")
+                    try:
+                        st.image(_read_file_bytes(a) if full else thumb, caption=name, use_column_width=False)
+                    except Exception:
+                        st.write(f"Attachment: {name}")
+                else:
                     st.write(f"Attachment: {name}")
-                st.download_button(label=f"Download {name}", data=data, file_name=name, key=f"dl_{key_prefix}_{a.get('id', idx)}")
+                st.download_button(label=f"Download {name}", data=lambda a=a: _read_file_bytes(a), file_name=name, mime=a.get("mime") or None, key=f"dl_{key_prefix}_{a.get('id', idx)}")
             elif isinstance(a, str):
                 pth = Path(a)
                 if not pth.exists():
                     st.caption(f"Missing attachment: {a}")
                     continue
-                try:
-                    st.image(str(pth), caption=pth.name, use_column_width=False)
-                except Exception:
+                if _is_image(None, pth.name):
+                    try:
+                        st.image(str(pth), caption=pth.name, use_column_width=False)
+                    except Exception:
+                        st.write(f"Attachment: {pth.name}")
+                else:
                     st.write(f"Attachment: {pth.name}")
-                data = _read_file_bytes(a)
-                st.download_button(label=f"Download {pth.name}", data=data, file_name=pth.name, key=f"dl_{key_prefix}_{idx}")
+                st.download_button(label=f"Download {pth.name}", data=lambda a=a: _read_file_bytes(a), file_name=pth.name, key=f"dl_{key_prefix}_{idx}")
             else:
                 st.write("Unknown attachment entry")
         except Exception as e:
             st.write("Attachment error:", e)
 
-def render_comment_history(item: Dict[str, Any]):
+def render_comment_history(item: Dict[str, Any], key_prefix: Optional[str] = None):
     history = item.get("comment_history", []) or []
     if not history:
         st.info("No conversation yet.")
         return
     history = sorted(history, key=lambda e: e.get("at", ""))
     st.markdown("#### Conversation / Chat History")
+    att_by_id = {a.get("id"): a for a in item.get("attachments", []) or [] if isinstance(a, dict)}
     for entry in history:
         actor = entry.get("actor", "system")
         at = entry.get("at", "")
         comment = entry.get("comment", "")
-        attachments = entry.get("attachments", []) or []
+        attachments = [att_by_id[a] for a in entry.get("attachment_ids", []) or [] if a in att_by_id]
+        attachments += entry.get("attachments", []) or []  # legacy, not yet collapsed
         if actor == "client":
             bg = "#e6f2ff"
             label = "Client"
@@ -626,9 +2003,48 @@ def render_comment_history(item: Dict[str, Any]):
         st.markdown(html, unsafe_allow_html=True)
         if attachments:
             # key prefix should avoid unsafe chars
-            base_key = f"{item['id']}_{actor}_{at.replace(':','_').replace(' ','_')}"
+            base_key = f"{key_prefix or item['id']}_{actor}_{at.replace(':','_').replace(' ','_')}"
             render_attachments_list(attachments, key_prefix=base_key)
 
+SORT_OPTIONS = {
+    "Board order": (None, False),
+    "Recently updated": ("updated_at", True),
+    "Newest": ("created_at", True),
+    "Oldest": ("created_at", False),
+}
+PAGE_SIZES = [10, 25, 50]
+
+def render_paged_bucket(name: str, key: str) -> List[Dict[str, Any]]:
+    """Sort / page-size / page controls for a section; returns only the items on the current page."""
+    total = items_store.count(name)
+    if total <= 1:
+        return items_store.page(name, 0, total)
+    c1, c2, c3 = st.columns([2, 1, 1])
+    sort, descending = SORT_OPTIONS[c1.selectbox("Sort", list(SORT_OPTIONS), key=f"sort_{key}")]
+    size = c2.selectbox("Per page", PAGE_SIZES, key=f"page_size_{key}")
+    pages = (total + size - 1) // size
+    page_key = f"page_{key}"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages  # section shrank under the current page
+    page = c3.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key) if pages > 1 else 1
+    return items_store.page(name, (page - 1) * size, size, sort=sort, descending=descending)
+
+def render_card_details(item: Dict[str, Any], key_prefix: str):
+    """Compact summary (counts + last message); attachments and the conversation are only rendered
+       once the card's details toggle is switched on. key_prefix must be unique per section, since
+       one item can show up in more than one."""
+    attachments = item.get("attachments", []) or []
+    history = item.get("comment_history", []) or []
+    summary = f"📎 {len(attachments)}  •  💬 {len(history)}"
+    if history:
+        last = max(history, key=lambda e: e.get("at", ""))
+        comment = (last.get("comment") or "").replace("\n", " ")
+        summary += f"  •  Last ({last.get('actor', 'system')}): {comment[:80]}{'…' if len(comment) > 80 else ''}"
+    st.caption(summary)
+    if (attachments or history) and st.toggle("Show attachments & conversation", key=f"details_{key_prefix}"):
+        render_attachments_list(attachments, key_prefix=key_prefix)
+        render_comment_history(item, key_prefix=key_prefix)
+
 # -------------------------
 # Developer Dashboard
 # -------------------------
@@ -636,30 +2052,25 @@ def developer_dashboard():
     st.title("👨‍💻 Developer Dashboard")
     st.caption("Use this board to manage tasks. When you complete a task you must enter hours + comment and can attach images. Completed tasks become visible to Client for approval.")
 
-    # KPIs
-    ready = get_items_by_status(st.session_state[STATE_KEY], "ready")
-    inprog = get_items_by_status(st.session_state[STATE_KEY], "inprogress")
-    # special section: tasks returned by client (review_requested True)
-    needs_dev_response = [it for it in st.session_state[STATE_KEY] if it.get("review_requested") and not it.get("archived")]
-    payments_pending = [it for it in st.session_state[STATE_KEY] if it.get("payment_requested") and not it.get("payment_confirmed_by_dev") and not it.get("archived")]
-
+    items = items_store
+    # KPIs straight from the bucket sizes
     st.subheader("Overview")
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Ready", len(ready))
-    col2.metric("In Progress", len(inprog))
-    col3.metric("Needs Dev Response", len(needs_dev_response))
-    col4.metric("Payment Requests", len(payments_pending))
+    col1.metric("Ready", items.count("ready"))
+    col2.metric("In Progress", items.count("inprogress"))
+    col3.metric("Needs Dev Response", items.count("needs_dev_response"))
+    col4.metric("Payment Requests", items.count("payments_pending"))
 
     st.markdown("---")
+    # special section: tasks returned by client (review_requested True)
     st.subheader("Needs Developer Response (sent back by client)")
-    if not needs_dev_response:
+    if not items.count("needs_dev_response"):
         st.info("No tasks sent back by client.")
     else:
-        for it in needs_dev_response:
+        for it in render_paged_bucket("needs_dev_response", "dev_ndr"):
             with st.expander(f"{it['title']} — #{it['id'][:8]}"):
                 st.write(f"Client: {it.get('client','')}  •  Project: {it.get('project','')}")
-                render_attachments_list(it.get("attachments", []), key_prefix=it["id"])
-                render_comment_history(it)
+                render_card_details(it, key_prefix=f"ndr_{it['id']}")
                 # Developer must provide comment and optionally attachments/hours/rate
                 with st.form(f"dev_resp_form_{it['id']}", clear_on_submit=False):
                     dev_comment = st.text_area("Response to client (REQUIRED)", key=f"dev_resp_{it['id']}")
@@ -672,7 +2083,7 @@ def developer_dashboard():
                             st.warning("Response comment is required.")
                         else:
                             files_list = add_files if add_files else []
-                            developer_respond_changes(st.session_state[STATE_KEY], it["id"], dev_comment.strip(), files_list, hours=(new_hours if new_hours>0 else None), rate=(new_rate if new_rate>0 else None))
+                            developer_respond_changes(items_store, it["id"], dev_comment.strip(), files_list, hours=(new_hours if new_hours>0 else None), rate=(new_rate if new_rate>0 else None))
                             st.success("Submitted back to client for approval.")
                             st.rerun()
 
@@ -682,15 +2093,14 @@ def developer_dashboard():
     # Ready column
     with cols[0]:
         st.markdown("### Ready")
-        if not ready:
+        if not items.count("ready"):
             st.info("No ready tasks.")
         else:
-            for it in ready:
+            for it in render_paged_bucket("ready", "dev_ready"):
                 with st.container():
                     st.markdown(f"**{it['title']}**  \n*{it['type']}* • `#{it['id'][:8]}`")
                     st.caption(f"Client: {it.get('client','')}  • Project: {it.get('project','')}")
-                    render_attachments_list(it.get("attachments", []), key_prefix=it["id"])
-                    render_comment_history(it)
+                    render_card_details(it, key_prefix=it["id"])
                     c1, c2, c3 = st.columns([1,1,1])
                     if c1.button("→ In Progress", key=f"to_inprog_{it['id']}"):
                         set_status_local(it["id"], "inprogress")
@@ -703,36 +2113,32 @@ def developer_dashboard():
                             add_files = st.file_uploader("Add attachments", accept_multiple_files=True, key=f"edit_files_{it['id']}")
                             save = st.form_submit_button("Save")
                             if save:
-                                it["title"] = new_title.strip()
-                                it["client"] = new_client.strip()
-                                it["project"] = new_project.strip()
-                                if add_files:
-                                    for f in add_files:
-                                        enc = _encode_uploaded_file_to_b64(f, it["id"])
-                                        if enc not in it.get("attachments", []):
-                                            it.setdefault("attachments", []).append(enc)
-                                            append_history(st.session_state[STATE_KEY], it["id"], "dev", "Added attachment", [f])
-                                it["updated_at"] = _now_iso()
-                                save_and_persist(st.session_state[STATE_KEY])
+                                with get_storage().transaction(items_store):
+                                    _update_item(items_store, it, {
+                                        "title": new_title.strip(),
+                                        "client": new_client.strip(),
+                                        "project": new_project.strip(),
+                                        "updated_at": _now_iso(),
+                                    })
+                                    if add_files:
+                                        append_history(items_store, it["id"], "dev", "Added attachment", list(add_files))
                                 st.success("Saved.")
                                 st.rerun()
                     if c3.button("Delete", key=f"del_{it['id']}"):
-                        st.session_state[STATE_KEY] = [x for x in st.session_state[STATE_KEY] if x.get("id") != it["id"]]
-                        save_and_persist(st.session_state[STATE_KEY])
+                        delete_item(items_store, it["id"])
                         st.rerun()
 
     # In Progress column
     with cols[1]:
         st.markdown("### In Progress")
-        if not inprog:
+        if not items.count("inprogress"):
             st.info("No in-progress tasks.")
         else:
-            for it in inprog:
+            for it in render_paged_bucket("inprogress", "dev_inprog"):
                 with st.container():
                     st.markdown(f"**{it['title']}**  \n*{it['type']}* • `#{it['id'][:8]}`")
                     st.caption(f"Client: {it.get('client','')}  • Project: {it.get('project','')}")
-                    render_attachments_list(it.get("attachments", []), key_prefix=it["id"])
-                    render_comment_history(it)
+                    render_card_details(it, key_prefix=it["id"])
 
                     # INLINE completion form for reliability:
                     with st.form(f"complete_form_inline_{it['id']}", clear_on_submit=False):
@@ -749,7 +2155,7 @@ def developer_dashboard():
                             elif (hours is None) or (hours == 0):
                                 st.warning("Please enter hours worked (can be fractional).")
                             else:
-                                developer_complete(st.session_state[STATE_KEY], it["id"], hours, rate, dev_comment.strip(), dev_files=files_list)
+                                developer_complete(items_store, it["id"], hours, rate, dev_comment.strip(), dev_files=files_list)
                                 st.success("Task completed and sent to client for approval.")
                                 st.rerun()
 
@@ -758,56 +2164,56 @@ def developer_dashboard():
                         set_status_local(it["id"], "ready")
                         st.rerun()
                     if c2.button("Delete", key=f"del2_{it['id']}"):
-                        st.session_state[STATE_KEY] = [x for x in st.session_state[STATE_KEY] if x.get("id") != it["id"]]
-                        save_and_persist(st.session_state[STATE_KEY])
+                        delete_item(items_store, it["id"])
                         st.rerun()
 
     st.markdown("---")
     st.subheader("Payments Requests (Pending confirmation)")
-    payments_pending = [it for it in st.session_state[STATE_KEY] if it.get("payment_requested") and not it.get("payment_confirmed_by_dev") and not it.get("archived")]
-    if not payments_pending:
+    if not items.count("payments_pending"):
         st.info("No payment requests.")
     else:
-        for it in payments_pending:
+        for it in render_paged_bucket("payments_pending", "dev_pay"):
             with st.expander(f"{it['title']} — #{it['id'][:8]}"):
                 st.write(f"Client: {it.get('client','')}, Amount: {it.get('amount')}")
-                render_comment_history(it)
+                render_card_details(it, key_prefix=f"pay_{it['id']}")
                 if st.button("Confirm payment received", key=f"confirm_pay_{it['id']}"):
-                    developer_confirm_payment(st.session_state[STATE_KEY], [it["id"]])
+                    developer_confirm_payment(items_store, [it["id"]])
                     st.success("Payment confirmed and task archived.")
                     st.rerun()
 
     st.markdown("---")
     st.subheader("Completed / Archived Tasks Table")
     # Show completed or archived tasks
-    show_table = [it for it in st.session_state[STATE_KEY] if (it.get("status") == "completed" or it.get("archived"))]
-    df_table = pd.DataFrame(show_table) if show_table else pd.DataFrame(columns=["id","title","client","project","hours","rate_at_completion","amount","status","archived"])
+    df_table = cached_items_table(id(items), items.generation, "completed_or_archived", items)
     if df_table.empty:
         st.info("No completed or archived tasks yet.")
     else:
         view = df_table[["id","title","type","client","project","hours","rate_at_completion","amount","status","archived"]].copy()
         view["id"] = view["id"].apply(lambda x: x[:8])
         st.dataframe(view, width="stretch")
-        total_hours = float(df_table["hours"].fillna(0).sum())
-        total_bill = float(df_table["amount"].fillna(0).sum())
-        st.markdown(f"**Totals (shown rows):** Hours = {total_hours:.2f} h  •  Bill = {total_bill:.2f}")
+        totals = (items.billing_summary(by=()) or [{"hours": 0.0, "amount": 0.0}])[0]
+        st.markdown(f"**Totals (shown rows):** Hours = {totals['hours']:.2f} h  •  Bill = {totals['amount']:.2f}")
+
+        st.markdown("#### Billing summary")
+        group_by = st.multiselect("Group by", list(BILLING_KEY), default=["client", "month"], key="billing_group_by")
+        summary = pd.DataFrame(items.billing_summary(by=tuple(f for f in BILLING_KEY if f in group_by)))
+        st.dataframe(summary, width="stretch", hide_index=True)
 
     st.markdown("---")
-    st.subheader("All tasks (raw JSON)")
+    st.subheader("All tasks")
     # render download buttons (CSV + JSON) side-by-side, JSON right after CSV
-    render_download_buttons(df_all, key_prefix="developer_all")
+    render_download_buttons(items_store, key_prefix="developer_all")
     st.dataframe(df_all, width="stretch")
 
 # helper to set status quickly (and persist)
 def set_status_local(item_id: str, new_status: str):
-    for it in st.session_state[STATE_KEY]:
-        if it.get("id") == item_id:
-            it["status"] = new_status
-            it["updated_at"] = _now_iso()
-            if new_status != "completed":
-                it["completed_at"] = None
-            save_and_persist(st.session_state[STATE_KEY])
-            return
+    it = items_store.get(item_id)
+    if it is None:
+        return
+    fields = {"status": new_status, "updated_at": _now_iso()}
+    if new_status != "completed":
+        fields["completed_at"] = None
+    _update_item(items_store, it, fields)
 
 # -------------------------
 # Client Dashboard (single page)
@@ -817,24 +2223,20 @@ def client_dashboard():
     st.caption("Client view is single-page: approve, request changes, or mark paid. Client cannot navigate to other pages.")
 
     st.markdown("### Tasks needing your attention")
-    needs_approval = [it for it in st.session_state[STATE_KEY] if it.get("status") == "completed" and it.get("needs_client_approval") and not it.get("archived")]
-    approved = [it for it in st.session_state[STATE_KEY] if it.get("status") == "completed" and it.get("client_approved") and not it.get("archived")]
-
     # ---------- Fixed: always-render Request Changes form inside each expander ----------
     st.markdown("#### Needs Approval")
-    if not needs_approval:
+    if not items_store.count("needs_approval"):
         st.info("No tasks waiting for approval.")
     else:
-        for it in needs_approval:
+        for it in render_paged_bucket("needs_approval", "client_na"):
             with st.expander(f"{it['title']} — #{it['id'][:8]}"):
                 st.write(f"Developer hours: {it.get('hours')}  •  Amount: {it.get('amount')}")
-                render_attachments_list(it.get("attachments", []), key_prefix=it["id"])
-                render_comment_history(it)
+                render_card_details(it, key_prefix=f"na_{it['id']}")
 
                 cols = st.columns([1,1])
                 # Approve button (quick action)
                 if cols[0].button("✅ Approve", key=f"c_approve_{it['id']}"):
-                    client_approve(st.session_state[STATE_KEY], it["id"])
+                    client_approve(items_store, it["id"])
                     st.success("Approved.")
                     st.rerun()
 
@@ -850,21 +2252,20 @@ def client_dashboard():
                                 st.warning("Please provide comments explaining required changes.")
                             else:
                                 files_list = list(owner_files) if owner_files else []
-                                client_request_changes(st.session_state[STATE_KEY], it['id'], comment.strip(), files_list if files_list else None)
+                                client_request_changes(items_store, it['id'], comment.strip(), files_list if files_list else None)
                                 st.success("Sent back to developer for fixes.")
                                 st.rerun()
     # -------------------------------------------------------------------------
 
     st.markdown("---")
     st.markdown("#### Approved Tasks")
-    if not approved:
+    if not items_store.count("approved"):
         st.info("No approved tasks.")
     else:
-        for it in approved:
+        for it in render_paged_bucket("approved", "client_ap"):
             with st.expander(f"{it['title']} — #{it['id'][:8]}"):
                 st.write(f"Hours: {it.get('hours')} • Amount: {it.get('amount')}")
-                render_attachments_list(it.get("attachments", []), key_prefix=it["id"])
-                render_comment_history(it)
+                render_card_details(it, key_prefix=f"ap_{it['id']}")
 
     st.markdown("---")
     st.subheader("Mark Approved Tasks as Paid (select date range)")
@@ -877,7 +2278,7 @@ def client_dashboard():
         except Exception:
             return False
         return (d >= start_d) and (d <= end_d)
-    approved_in_range = [it for it in approved if it.get("completed_at") and in_range(it.get("completed_at")) and not it.get("payment_requested")]
+    approved_in_range = [it for it in items_store.bucket("approved") if it.get("completed_at") and in_range(it.get("completed_at")) and not it.get("payment_requested")]
     if not approved_in_range:
         st.info("No approved tasks in selected date range available for payment.")
     else:
@@ -888,20 +2289,29 @@ def client_dashboard():
                 ids.append(it["id"])
         if ids:
             if st.button("Mark selected as Paid"):
-                client_mark_paid(st.session_state[STATE_KEY], ids)
+                client_mark_paid(items_store, ids)
                 st.success("Marked as Paid — developer will confirm receipt.")
                 st.rerun()
 
     st.markdown("---")
     st.subheader("All tasks (client view)")
     # render download buttons (CSV + JSON) with JSON right after CSV
-    render_download_buttons(df_all, key_prefix="client_all")
+    render_download_buttons(items_store, key_prefix="client_all")
     st.dataframe(df_all, width="stretch")
 
 # -------------------------
 # Page routing & launch
 # -------------------------
-if page == "client":
-    client_dashboard()
-else:
-    developer_dashboard()
+# a flow that lost an optimistic-concurrency race has already reloaded the affected items; rerun
+# so the user sees the current state and can redo the action. Matched by name: the cached storage
+# raises the ConflictError class of the script run that created it, not this run's
+try:
+    if page == "client":
+        client_dashboard()
+    else:
+        developer_dashboard()
+except Exception as e:
+    if type(e).__name__ != "ConflictError":
+        raise
+    st.session_state["flash"] = "Someone else changed this item in the meantime — reloaded the latest version, please try again."
+    st.rerun()
@@ -0,0 +1,19 @@
+import json
+from pathlib import Path
+
+import pytest
+
+SOURCE = Path(__file__).resolve().parent.parent / "dashboard.py"
+
+
+@pytest.fixture
+def dash(tmp_path, monkeypatch):
+    """dashboard.py's definitions (everything before the Streamlit page itself), run in tmp_path
+       with a tasks_data.json holding two items, "X" and "Y"."""
+    monkeypatch.chdir(tmp_path)
+    src = SOURCE.read_text(encoding="utf-8")
+    ns = {"__name__": "dashboard_under_test"}
+    exec(compile(src[:src.index("# -------------------------\n# Session init")], str(SOURCE), "exec"), ns)
+    items = [ns["new_item"](title, "task", "acme", "p", True) for title in ("X", "Y")]
+    Path("tasks_data.json").write_text(json.dumps(items), encoding="utf-8")
+    return ns
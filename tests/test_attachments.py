@@ -0,0 +1,20 @@
+"""collapse_comment_attachments: every copy of an upload ends up as one item-level record plus id references."""
+
+
+def test_collapse_merges_duplicate_uploads(dash):
+    sha = dash["put_blob"](b"png-bytes")
+    att = lambda i: {"id": i, "name": "shot.png", "mime": "image/png", "sha256": sha, "size": 9}
+    item = {
+        "id": "it1",
+        "attachments": [att("it1_aaa"), att("it1_bbb")],
+        "comment_history": [
+            {"actor": "dev", "comment": "edit", "at": "1", "attachment_ids": ["it1_aaa", "it1_bbb"]},
+            {"actor": "dev", "comment": "again", "at": "2", "attachment_ids": ["it1_bbb"]},
+            # legacy copy on the entry, only known by content
+            {"actor": "dev", "comment": "legacy", "at": "3", "attachments": [att("it1_ccc")]},
+        ],
+    }
+    assert dash["collapse_comment_attachments"]([item]) > 0
+    assert [a["id"] for a in item["attachments"]] == ["it1_aaa"]
+    assert [e["attachment_ids"] for e in item["comment_history"]] == [["it1_aaa"], ["it1_aaa"], ["it1_aaa"]]
+    assert dash["collapse_comment_attachments"]([item]) == 0
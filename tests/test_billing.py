@@ -0,0 +1,51 @@
+"""ItemStore.billing_summary is maintained incrementally; check it against a from-scratch total."""
+import random
+
+
+def _full(ns, items):
+    totals = {}
+    for it in items:
+        if not (it.get("status") == "completed" or it.get("archived")):
+            continue
+        key = (it.get("client") or "", it.get("project") or "", bool(it.get("billable")), (it.get("completed_at") or "")[:7])
+        acc = totals.setdefault(key, [0.0, 0.0, 0])
+        acc[0] += ns["_to_float"](it.get("hours"))
+        acc[1] += ns["_to_float"](it.get("amount"))
+        acc[2] += 1
+    return {key: (round(h, 2), round(a, 2), n) for key, (h, a, n) in totals.items()}
+
+
+def _incremental(items):
+    return {(r["client"], r["project"], r["billable"], r["month"]): (r["hours"], r["amount"], r["tasks"]) for r in items.billing_summary()}
+
+
+def test_billing_summary_matches_full_recompute(dash):
+    storage = dash["JsonFileStorage"]()
+    dash["get_storage"] = lambda: storage
+    items = dash["ItemStore"](storage.load())
+    rng = random.Random(1)
+    for n in range(20):
+        dash["add_item"](items, dash["new_item"](f"t{n}", "task", rng.choice(["acme", "globex"]), rng.choice(["p", "q"]), rng.random() < 0.7))
+    assert _incremental(items) == _full(dash, items) == {}
+    for _ in range(300):
+        ids = [it["id"] for it in items]
+        item_id = rng.choice(ids)
+        r = rng.random()
+        if r < 0.3:
+            dash["developer_complete"](items, item_id, rng.choice([0.5, 1.25, 2.0]), 80.0, "done")
+        elif r < 0.45:
+            dash["_update_item"](items, items.get(item_id), {"status": "ready"})
+        elif r < 0.6:
+            dash["developer_respond_changes"](items, item_id, "fixed", [], hours=3.0, rate=90.0)
+        elif r < 0.7:
+            dash["developer_confirm_payment"](items, [item_id])
+        elif r < 0.8:
+            dash["_update_item"](items, items.get(item_id), {"client": rng.choice(["acme", "globex", "initech"])})
+        elif r < 0.85 and len(ids) > 5:
+            dash["delete_item"](items, item_id)
+        else:
+            dash["add_item"](items, dict(dash["new_item"]("n", "task", "acme", "p", False), status="completed", completed_at="2025-05-05", hours=1.0, amount=7.0))
+    summary = _incremental(items)
+    assert summary and summary == _full(dash, items)
+    # and a store rebuilt from what was persisted agrees
+    assert _incremental(dash["ItemStore"](dash["JsonFileStorage"]().load())) == summary
@@ -0,0 +1,26 @@
+"""Spreadsheet / CSV import: rows are reported by their real sheet row or CSV line number."""
+import io
+
+import pytest
+
+
+def test_import_reports_sheet_row_numbers(dash):
+    csv_bytes = b'title,type\nok,task\n\n"multi\nline",task\nbad,bug\n'
+    rows = list(dash["iter_import_rows"](io.BytesIO(csv_bytes), "qa.csv"))
+    assert [n for n, _ in rows] == [2, 4, 6]
+    added, errors = dash["import_items"](dash["ItemStore"](), rows)
+    assert added == 2 and errors == [(6, "type must be one of task, defect")]
+
+
+def test_import_xlsx_row_numbers_skip_blank_rows(dash, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["title", "type"])
+    ws.append(["ok", "task"])
+    ws.append([None, None])
+    ws.append(["bad", "bug"])
+    wb.save(tmp_path / "qa.xlsx")
+    with open(tmp_path / "qa.xlsx", "rb") as f:
+        rows = list(dash["iter_import_rows"](f, "qa.xlsx"))
+    assert [n for n, _ in rows] == [2, 4]
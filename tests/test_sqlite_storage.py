@@ -0,0 +1,121 @@
+"""Tests for SqliteStorage: version-guarded writes, generation-based refresh and the first-run JSON
+   import. Two storage/store pairs on the same database stand in for two server processes."""
+import base64
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+
+def _process(ns):
+    storage = ns["SqliteStorage"]()
+    return storage, ns["ItemStore"](storage.load())
+
+
+def _update(ns, storage, items, item_id, fields):
+    ns["get_storage"] = lambda: storage
+    with storage.transaction(items):
+        ns["_update_item"](items, items.get(item_id), fields)
+
+
+def _ids(items):
+    return {it["title"]: it["id"] for it in items}
+
+
+def _meta(key):
+    with sqlite3.connect("tasks_data.sqlite3") as con:
+        row = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def test_first_run_imports_json_once(dash):
+    raw = json.loads(Path("tasks_data.json").read_text(encoding="utf-8"))
+    raw[0]["attachments"] = [{"name": "a.txt", "mime": "text/plain", "data": base64.b64encode(b"hello").decode()}]
+    Path("tasks_data.json").write_text(json.dumps(raw), encoding="utf-8")
+    _, items = _process(dash)
+    assert sorted(_ids(items)) == ["X", "Y"]
+    att = items.get(raw[0]["id"])["attachments"][0]
+    # inline payloads go to the blob store on import
+    assert "data" not in att and dash["get_blob"](att["sha256"]) == b"hello"
+    assert _meta("json_imported")
+    # later runs read the database, not the JSON file
+    Path("tasks_data.json").write_text("[]", encoding="utf-8")
+    assert sorted(_ids(_process(dash)[1])) == ["X", "Y"]
+
+
+def test_stale_update_conflicts_and_reloads(dash):
+    a_storage, a = _process(dash)
+    b_storage, b = _process(dash)
+    x = _ids(a)["X"]
+    _update(dash, a_storage, a, x, {"hours": 1.0})
+    with pytest.raises(dash["ConflictError"]):
+        _update(dash, b_storage, b, x, {"hours": 2.0})
+    assert b.get(x)["hours"] == 1.0
+    _update(dash, b_storage, b, x, {"hours": 3.0})
+    assert _process(dash)[1].get(x)["hours"] == 3.0
+
+
+def test_stale_delete_conflicts(dash):
+    a_storage, a = _process(dash)
+    b_storage, b = _process(dash)
+    x = _ids(a)["X"]
+    _update(dash, a_storage, a, x, {"title": "X from a"})
+    dash["get_storage"] = lambda: b_storage
+    with pytest.raises(dash["ConflictError"]):
+        dash["delete_item"](b, x)
+    # the delete was rolled back and b has the stored item again
+    assert b.get(x)["title"] == "X from a"
+    assert _process(dash)[1].get(x) is not None
+    dash["delete_item"](b, x)
+    assert _process(dash)[1].get(x) is None
+
+
+def test_aborted_transaction_keeps_foreign_writes(dash):
+    a_storage, a = _process(dash)
+    b_storage, b = _process(dash)
+    x, y = _ids(a)["X"], _ids(a)["Y"]
+    _update(dash, a_storage, a, y, {"title": "Y from a"})
+    dash["get_storage"] = lambda: b_storage
+    with pytest.raises(RuntimeError):
+        with b_storage.transaction(b):
+            dash["_update_item"](b, b.get(x), {"hours": 5.0})
+            raise RuntimeError("boom")
+    assert b.get(x)["hours"] is None
+    with pytest.raises(dash["ConflictError"]):
+        _update(dash, b_storage, b, y, {"title": "Y from b"})
+    assert b.get(y)["title"] == "Y from a"
+    # X was reloaded at its stored version, so writing it now succeeds
+    _update(dash, b_storage, b, x, {"hours": 6.0})
+    assert _process(dash)[1].get(x)["hours"] == 6.0
+
+
+def test_refresh_follows_generation(dash):
+    a_storage, a = _process(dash)
+    b_storage, b = _process(dash)
+    x, y = _ids(a)["X"], _ids(a)["Y"]
+    assert not b_storage.refresh(b)
+    gen = int(_meta("generation"))
+    _update(dash, a_storage, a, y, {"title": "Y from a"})
+    assert int(_meta("generation")) == gen + 1
+    assert b_storage.refresh(b)
+    assert b.get(y)["title"] == "Y from a" and b.get(y)["version"] == a.get(y)["version"]
+    assert not b_storage.refresh(b)
+    # our own write doesn't count as news
+    _update(dash, b_storage, b, x, {"hours": 1.0})
+    assert not b_storage.refresh(b)
+    assert a_storage.refresh(a) and a.get(x)["hours"] == 1.0
+
+
+def test_save_items_skips_rows_changed_meanwhile(dash):
+    a_storage, a = _process(dash)
+    b_storage, b = _process(dash)
+    x, y = _ids(a)["X"], _ids(a)["Y"]
+    _update(dash, a_storage, a, y, {"title": "Y from a"})
+    b.get(x)["title"] = "X rewritten"
+    b.get(y)["title"] = "Y rewritten"
+    b_storage.save_items(b, [x, y])
+    fresh = _process(dash)[1]
+    assert fresh.get(x)["title"] == "X rewritten"
+    assert fresh.get(y)["title"] == "Y from a"
+    assert b.get(y)["title"] == "Y from a"
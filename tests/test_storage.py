@@ -0,0 +1,118 @@
+"""Optimistic-concurrency tests for JsonFileStorage: two storage/store pairs on the same files
+   stand in for two server processes."""
+import base64
+import json
+from pathlib import Path
+
+import pytest
+
+
+def _process(ns):
+    storage = ns["JsonFileStorage"]()
+    return storage, ns["ItemStore"](storage.load())
+
+
+def _update(ns, storage, items, item_id, fields):
+    ns["get_storage"] = lambda: storage
+    with storage.transaction(items):
+        ns["_update_item"](items, items.get(item_id), fields)
+
+
+def _ids(items):
+    return {it["title"]: it["id"] for it in items}
+
+
+def test_stale_write_conflicts_and_reloads(dash):
+    a_storage, a = _process(dash)
+    b_storage, b = _process(dash)
+    x = _ids(a)["X"]
+    _update(dash, a_storage, a, x, {"hours": 1.0})
+    with pytest.raises(dash["ConflictError"]):
+        _update(dash, b_storage, b, x, {"hours": 2.0})
+    # b got the stored state back, so the retry is based on the current version
+    assert b.get(x)["hours"] == 1.0
+    _update(dash, b_storage, b, x, {"hours": 3.0})
+    assert _process(dash)[1].get(x)["hours"] == 3.0
+
+
+def test_aborted_transaction_keeps_foreign_journal_records(dash):
+    a_storage, a = _process(dash)
+    b_storage, b = _process(dash)
+    x, y = _ids(a)["X"], _ids(a)["Y"]
+    _update(dash, a_storage, a, y, {"title": "Y from a"})
+    # b aborts a unit of work on X: X is reloaded from disk, but a's change to Y must not be lost
+    dash["get_storage"] = lambda: b_storage
+    with pytest.raises(RuntimeError):
+        with b_storage.transaction(b):
+            dash["_update_item"](b, b.get(x), {"hours": 5.0})
+            raise RuntimeError("boom")
+    assert b.get(x)["hours"] is None
+    # a stale write to Y is still caught...
+    with pytest.raises(dash["ConflictError"]):
+        _update(dash, b_storage, b, y, {"title": "Y from b"})
+    assert b.get(y)["title"] == "Y from a"
+
+
+def test_write_after_abort_reload_succeeds(dash):
+    a_storage, a = _process(dash)
+    b_storage, b = _process(dash)
+    x = _ids(a)["X"]
+    _update(dash, a_storage, a, x, {"title": "X from a"})
+    dash["get_storage"] = lambda: b_storage
+    with pytest.raises(RuntimeError):
+        with b_storage.transaction(b):
+            dash["_update_item"](b, b.get(x), {"hours": 5.0})
+            raise RuntimeError("boom")
+    # X was reloaded at a's version, so writing it now is not a conflict
+    assert b.get(x)["version"] == a.get(x)["version"]
+    _update(dash, b_storage, b, x, {"hours": 6.0})
+    fresh = _process(dash)[1].get(x)
+    assert (fresh["title"], fresh["hours"]) == ("X from a", 6.0)
+
+
+def test_refresh_picks_up_foreign_write_after_abort(dash):
+    a_storage, a = _process(dash)
+    b_storage, b = _process(dash)
+    x, y = _ids(a)["X"], _ids(a)["Y"]
+    _update(dash, a_storage, a, y, {"title": "Y from a"})
+    dash["get_storage"] = lambda: b_storage
+    with pytest.raises(RuntimeError):
+        with b_storage.transaction(b):
+            dash["_update_item"](b, b.get(x), {"hours": 5.0})
+            raise RuntimeError("boom")
+    assert b_storage.refresh(b)
+    assert b.get(y)["title"] == "Y from a"
+    assert b.get(y)["version"] == a.get(y)["version"]
+
+
+def test_append_after_torn_journal_line(dash):
+    a_storage, a = _process(dash)
+    x, y = _ids(a)["X"], _ids(a)["Y"]
+    _update(dash, a_storage, a, x, {"hours": 1.0})
+    # a writer crashed halfway through its append
+    with open("tasks_data.journal", "a", encoding="utf-8") as f:
+        f.write('{"op":"update","id":"%s","fields":{"tit' % y)
+    _update(dash, a_storage, a, y, {"title": "Y again"})
+    fresh = _process(dash)[1]
+    assert fresh.get(x)["hours"] == 1.0
+    assert fresh.get(y)["title"] == "Y again"
+
+
+def test_load_migration_keeps_foreign_writes(dash):
+    raw = json.loads(Path("tasks_data.json").read_text(encoding="utf-8"))
+    raw[0]["attachments"] = [{"name": "a.txt", "mime": "text/plain", "data": base64.b64encode(b"hello").decode()}]
+    Path("tasks_data.json").write_text(json.dumps(raw), encoding="utf-8")
+    a_storage, a = _process(dash)
+    b_storage, b = _process(dash)
+    x, y = _ids(a)["X"], _ids(a)["Y"]
+    # a writes between b's load and b rewriting the items its migration touched
+    _update(dash, a_storage, a, y, {"title": "Y from a"})
+    changed = set()
+    dash["migrate_inline_attachments"](b, changed)
+    assert changed == {x}
+    dash["get_storage"] = lambda: b_storage
+    dash["save_and_persist"](b, changed)
+    fresh = _process(dash)[1]
+    assert fresh.get(y)["title"] == "Y from a"
+    assert fresh.get(x)["attachments"][0]["sha256"] and "data" not in fresh.get(x)["attachments"][0]
+    assert fresh.get(x)["version"] == a.get(x)["version"] + 1